@@ -0,0 +1,312 @@
+"""
+Compact append-only archive of finished games
+
+An archive is a data file holding one packed record per game and an index
+file (the data file's name plus ".idx") holding the offset of each record,
+so a reader can jump straight to any game without scanning the ones before
+it. Each record is a fixed header (board side length, result, why the game
+ended, number of moves), the two players' names and then the moves, each
+stored as its number of steps followed by one byte per step.
+"""
+import mmap
+import struct
+
+# (bytes): the first bytes of every data file and index file
+DATA_MAGIC = b"CKRARCH1"
+INDEX_MAGIC = b"CKRAIDX1"
+
+# (tuple[str]): the results a game can be stored with, by code
+WINNERS = ("draw", "black", "red")
+
+# (tuple[str]): the reasons a game can have ended, by code ("quit" games
+# were abandoned before they finished and are stored as draws)
+REASONS = ("no-moves", "turn-limit", "resigned", "repetition", "no-progress",
+           "quit")
+
+# Record header: side length, winner code, reason code, length of the black
+# player's name, length of the red player's name, number of moves and number
+# of bytes the moves take up
+_HEADER = struct.Struct("<BBBBBII")
+
+# Index entries: the offset of a record in the data file
+_OFFSET = struct.Struct("<Q")
+
+# (int): the largest side length whose dark squares fit in one byte each
+MAX_SIDE = 22
+
+def encode_square(loc, side):
+    """
+    Packs a dark square into a byte. Squares are numbered in reading order
+    and every pair of neighboring squares in a row holds exactly one dark
+    square, so halving a square's number gives a unique code.
+
+    Parameters:
+        (tuple[int, int]) loc: the square's row and column
+        (int) side: the board's side length
+
+    Returns:
+        (int): the square's code
+    """
+    row, col = loc
+    return (row * side + col) // 2
+
+def decode_square(code, side):
+    """
+    Unpacks a byte written by encode_square.
+
+    Parameters:
+        (int) code: the square's code
+        (int) side: the board's side length
+
+    Returns:
+        (tuple[int, int]): the square's row and column
+    """
+    row, col = divmod(2 * code, side)
+    if (row + col) % 2 == 0:
+        col += 1
+    return row, col
+
+def _encode_name(name):
+    """
+    Encodes a player's name for a record header, cut to the 255 bytes a
+    header can hold without splitting a character in two
+
+    Parameters:
+        (str) name: the name
+
+    Returns:
+        (bytes): the name in UTF-8
+    """
+    return name.encode()[:255].decode("utf-8", "ignore").encode()
+
+def _open_with_magic(path, magic):
+    """
+    Opens a file for appending, writing magic first if the file is new and
+    checking it otherwise
+
+    Parameters:
+        (str) path: the file to open
+        (bytes) magic: the bytes the file starts with
+
+    Returns:
+        (file): the file, open for appending in binary mode
+    """
+    f = open(path, "ab")
+    if f.tell() == 0:
+        f.write(magic)
+    else:
+        with open(path, "rb") as check:
+            if check.read(len(magic)) != magic:
+                f.close()
+                raise ValueError(f"{path} is not a game archive")
+    return f
+
+class ArchiveWriter:
+    """
+    Appends finished games to an archive. A game's record is written before
+    its index entry, so a crash can at worst leave an unindexed record that
+    readers never see.
+    """
+
+    def __init__(self, path):
+        """
+        Constructor
+
+        Parameters:
+            (str) path: the archive's data file (created if missing)
+        """
+        # (file): the data file, open for appending
+        self._data = _open_with_magic(path, DATA_MAGIC)
+
+        # (file): the index file, open for appending
+        self._index = _open_with_magic(path + ".idx", INDEX_MAGIC)
+
+    def write_game(self, side, black, red, winner, reason, moves):
+        """
+        Appends a game
+
+        Parameters:
+            (int) side: the board's side length
+            (str) black: the black player's name
+            (str) red: the red player's name
+            (str) winner: "black", "red" or "draw"
+            (str) reason: why the game ended (one of REASONS)
+            (list[list[tuple[int, int]]]) moves: every move made from the
+                starting position, as the squares it steps through
+
+        Returns: None
+        """
+        if side > MAX_SIDE:
+            raise ValueError(f"boards larger than {MAX_SIDE}x{MAX_SIDE} "
+                             "cannot be archived")
+        black = _encode_name(black)
+        red = _encode_name(red)
+        packed = bytearray()
+        for steps in moves:
+            packed.append(len(steps))
+            packed.extend(encode_square(loc, side) for loc in steps)
+
+        offset = self._data.tell()
+        self._data.write(_HEADER.pack(side, WINNERS.index(winner),
+                                      REASONS.index(reason), len(black),
+                                      len(red), len(moves), len(packed)))
+        self._data.write(black + red + packed)
+        self._data.flush()
+        self._index.write(_OFFSET.pack(offset))
+        self._index.flush()
+
+    def close(self):
+        """
+        Closes the archive
+
+        Parameters: None
+
+        Returns: None
+        """
+        self._data.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class ArchivedGame:
+    """
+    A game read from an archive. The header fields are read straight away,
+    but the moves are only unpacked when get_moves is called.
+    """
+    __slots__ = ("side", "black", "red", "winner", "reason", "plies",
+                 "_packed")
+
+    def __init__(self, side, black, red, winner, reason, plies, packed):
+        """
+        Constructor
+
+        Parameters:
+            (int) side: the board's side length
+            (str) black: the black player's name
+            (str) red: the red player's name
+            (str) winner: "black", "red" or "draw"
+            (str) reason: why the game ended
+            (int) plies: how many moves were made
+            (bytes) packed: the packed moves
+        """
+        self.side = side
+        self.black = black
+        self.red = red
+        self.winner = winner
+        self.reason = reason
+        self.plies = plies
+        self._packed = packed
+
+    def get_moves(self):
+        """
+        Unpacks the game's moves
+
+        Parameters: None
+
+        Returns:
+            (list[list[tuple[int, int]]]): every move, as the squares it
+                steps through
+        """
+        moves = []
+        packed = self._packed
+        i = 0
+        while i < len(packed):
+            count = packed[i]
+            moves.append([decode_square(code, self.side)
+                          for code in packed[i + 1:i + 1 + count]])
+            i += 1 + count
+        return moves
+
+class ArchiveReader:
+    """
+    Reads games from an archive by memory-mapping its data and index files,
+    so opening even a very large archive costs the same and games are only
+    unpacked when they are asked for
+    """
+
+    def __init__(self, path):
+        """
+        Constructor
+
+        Parameters:
+            (str) path: the archive's data file
+        """
+        with open(path, "rb") as f:
+            # (mmap.mmap): the data file
+            self._data = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        if self._data[:len(DATA_MAGIC)] != DATA_MAGIC:
+            self._data.close()
+            raise ValueError(f"{path} is not a game archive")
+
+        # A missing or unreadable index must not leave the data file mapped
+        try:
+            with open(path + ".idx", "rb") as f:
+                # (mmap.mmap): the index file
+                self._index = mmap.mmap(f.fileno(), 0,
+                                        access = mmap.ACCESS_READ)
+        except BaseException:
+            self._data.close()
+            raise
+        if self._index[:len(INDEX_MAGIC)] != INDEX_MAGIC:
+            self.close()
+            raise ValueError(f"{path}.idx is not a game archive index")
+
+        # (int): how many games are indexed, ignoring a half-written last
+        # entry
+        self._count = ((len(self._index) - len(INDEX_MAGIC))
+                       // _OFFSET.size)
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        """
+        Reads one game
+
+        Parameters:
+            (int) i: the game's position in the archive
+
+        Returns:
+            (ArchivedGame): the game
+        """
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("archive index out of range")
+        (offset,) = _OFFSET.unpack_from(self._index,
+                                        len(INDEX_MAGIC) + i * _OFFSET.size)
+        (side, winner, reason, black_len, red_len, plies,
+         packed_len) = _HEADER.unpack_from(self._data, offset)
+        start = offset + _HEADER.size
+        black = self._data[start:start + black_len].decode()
+        start += black_len
+        red = self._data[start:start + red_len].decode()
+        start += red_len
+        packed = self._data[start:start + packed_len]
+        return ArchivedGame(side, black, red, WINNERS[winner],
+                            REASONS[reason], plies, packed)
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self[i]
+
+    def close(self):
+        """
+        Closes the archive
+
+        Parameters: None
+
+        Returns: None
+        """
+        self._index.close()
+        self._data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
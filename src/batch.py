@@ -0,0 +1,594 @@
+"""
+Vectorized lockstep simulation of games between random bots
+
+Thousands of games are kept in NumPy arrays and all advance one move per
+step, so random-vs-random baselines run far faster than with simulate in
+bot.py. The rules match CheckerBoard: captures are compulsory, multi-jumps
+continue until no capture is left, a piece is only crowned when its move
+ends on the far row, and a game ends as soon as either player cannot move.
+Games are also drawn when a position comes up for the third time with the
+same player to move, and optionally by a no-progress limit.
+Like a random Bot, each move is picked uniformly among all of the player's
+complete moves (so among complete multi-jumps when a capture is possible).
+
+Each board is stored as four 64-bit bitboards (black men, black kings, red
+men, red kings) over its dark squares, numbered so that a diagonal step is
+a shift by half the board's width or one more, with an unused "ghost" bit
+after every second row that catches steps off the side of the board. This
+fits boards of up to 10x10 squares (--board-size 4).
+"""
+import numpy as np
+
+# (int): the largest number of rows of pieces per player whose board fits in
+# a 64-bit bitboard
+MAX_ROWS = 4
+
+# (int): the indices of each bitboard in a position array (see new_boards);
+# player p's men and kings are at 2 * p and 2 * p + 1 (black is 0, red 1)
+BLACK_MEN = 0
+BLACK_KINGS = 1
+RED_MEN = 2
+RED_KINGS = 3
+
+_ONE = np.uint64(1)
+
+if hasattr(np, "bitwise_count"):
+    _popcount = np.bitwise_count
+else:
+    def _popcount(x):
+        """
+        Counts the set bits of each word (for NumPy before 2.0).
+
+        Parameters:
+            (np.ndarray) x: uint64 array
+
+        Returns:
+            (np.ndarray): the number of set bits in each word
+        """
+        x = x - ((x >> np.uint64(1)) & np.uint64(0x5555555555555555))
+        x = ((x & np.uint64(0x3333333333333333))
+             + ((x >> np.uint64(2)) & np.uint64(0x3333333333333333)))
+        x = (x + (x >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+        return (x * np.uint64(0x0101010101010101)) >> np.uint64(56)
+
+class _Layout:
+    """
+    The bit numbering of one board size
+    """
+    __slots__ = ("size", "shifts", "valid", "far_rows", "start")
+
+    def __init__(self, n):
+        """
+        Constructor
+
+        Parameters:
+            (int) n: the number of rows of pieces each player starts with
+        """
+        size = 2 * n + 2
+        half = size // 2
+
+        # (int): the side length of the board
+        self.size = size
+
+        # (tuple[int]): the shift of each diagonal direction; positive
+        # shifts go down the board (black's forward directions)
+        self.shifts = (half, half + 1, -half, -half - 1)
+
+        bits = {}
+        for row in range(size):
+            for col in range(size):
+                if (row + col) % 2 == 1:
+                    bits[(row, col)] = row * half + col // 2 + row // 2
+
+        # (np.uint64): every square's bit
+        self.valid = _mask(bits.values())
+
+        # (tuple[np.uint64, np.uint64]): the rows where black's and red's
+        # men are crowned
+        self.far_rows = (_mask(bit for (row, _), bit in bits.items()
+                               if row == size - 1),
+                         _mask(bit for (row, _), bit in bits.items()
+                               if row == 0))
+
+        # (tuple[np.uint64]): the starting bitboards
+        self.start = (_mask(bit for (row, _), bit in bits.items() if row < n),
+                      np.uint64(0),
+                      _mask(bit for (row, _), bit in bits.items()
+                            if row >= size - n),
+                      np.uint64(0))
+
+# (dict[int, _Layout]): the layout of each board size (see _get_layout)
+_layouts = {}
+
+def _get_layout(n):
+    """
+    Returns the layout of a board size, working it out the first time.
+
+    Parameters:
+        (int) n: the number of rows of pieces each player starts with
+
+    Returns:
+        (_Layout): the layout
+    """
+    if not 1 <= n <= MAX_ROWS:
+        raise ValueError(f"batch runs support board sizes 1 to {MAX_ROWS}")
+    if n not in _layouts:
+        _layouts[n] = _Layout(n)
+    return _layouts[n]
+
+def _mask(bits):
+    """
+    Builds a bitboard with the given bits set.
+
+    Parameters:
+        (iterable[int]) bits: the bit numbers
+
+    Returns:
+        (np.uint64): the bitboard
+    """
+    mask = 0
+    for bit in bits:
+        mask |= 1 << bit
+    return np.uint64(mask)
+
+def _shift(words, shift):
+    """
+    Shifts bitboards by a signed amount (positive shifts go down the board).
+
+    Parameters:
+        (np.ndarray or np.uint64) words: the bitboards
+        (int) shift: the shift
+
+    Returns:
+        (np.ndarray): the shifted bitboards
+    """
+    if shift > 0:
+        return words << np.uint64(shift)
+    return words >> np.uint64(-shift)
+
+def new_boards(count, n):
+    """
+    Creates a stack of boards in the starting position.
+
+    Parameters:
+        (int) count: how many boards to create
+        (int) n: the number of rows of pieces each player has
+
+    Returns:
+        (np.ndarray): uint64 array of shape (4, count) holding each board's
+            black men, black kings, red men and red kings
+    """
+    start = _get_layout(n).start
+    return np.array([np.full(count, word, np.uint64) for word in start])
+
+def move_masks(boards, player, layout):
+    """
+    Finds which pieces can step and which can jump in each direction.
+
+    Parameters:
+        (np.ndarray) boards: positions (see new_boards)
+        (int) player: 0 for black, 1 for red
+        (_Layout) layout: the board's layout
+
+    Returns:
+        (tuple[np.ndarray, np.ndarray]): uint64 arrays of shape (4, boards)
+            marking, for each direction of layout.shifts, the pieces that can
+            step and the pieces that can start a jump that way
+    """
+    men = boards[2 * player]
+    kings = boards[2 * player + 1]
+    opponents = boards[2 - 2 * player] | boards[3 - 2 * player]
+    empty = layout.valid & ~(men | kings | opponents)
+
+    count = boards.shape[1]
+    steps = np.empty((4, count), np.uint64)
+    jumps = np.empty((4, count), np.uint64)
+    for k, shift in enumerate(layout.shifts):
+        # Men only move towards the opponent's side
+        movers = men | kings if (shift > 0) == (player == 0) else kings
+        steps[k] = movers & _shift(empty, -shift)
+        jumps[k] = movers & _shift(opponents, -shift) & _shift(empty, -2 * shift)
+    return steps, jumps
+
+def can_move(boards, player, layout):
+    """
+    Checks which boards player has a legal move on, without working out the
+    moves.
+
+    Parameters:
+        (np.ndarray) boards: positions (see new_boards)
+        (int) player: 0 for black, 1 for red
+        (_Layout) layout: the board's layout
+
+    Returns:
+        (np.ndarray): boolean array, True where player can move
+    """
+    men = boards[2 * player]
+    kings = boards[2 * player + 1]
+    opponents = boards[2 - 2 * player] | boards[3 - 2 * player]
+    empty = layout.valid & ~(men | kings | opponents)
+
+    movable = np.zeros(boards.shape[1], np.uint64)
+    for shift in layout.shifts:
+        movers = men | kings if (shift > 0) == (player == 0) else kings
+        movable |= movers & (_shift(empty, -shift)
+                             | (_shift(opponents, -shift)
+                                & _shift(empty, -2 * shift)))
+    return movable != 0
+
+def _select_bits(words, ranks):
+    """
+    Finds the set bit of the given rank (counting from the lowest) in each
+    word.
+
+    Parameters:
+        (np.ndarray) words: uint64 array
+        (np.ndarray) ranks: int64 array, each below its word's bit count
+
+    Returns:
+        (np.ndarray): uint64 array holding only the chosen bit of each word
+    """
+    offsets = np.zeros(len(words), np.uint64)
+    for width in (32, 16, 8, 4, 2, 1):
+        low = _popcount((words >> offsets)
+                        & np.uint64((1 << width) - 1)).astype(np.int64)
+        higher = ranks >= low
+        ranks -= low * higher
+        offsets += np.uint64(width) * higher
+    return _ONE << offsets
+
+def _split_bits(games, words):
+    """
+    Splits bitboards into one entry per set bit.
+
+    Parameters:
+        (np.ndarray) games: the index of each bitboard's game
+        (np.ndarray) words: the bitboards
+
+    Returns:
+        (tuple[np.ndarray, np.ndarray]): the game and bit of each entry
+    """
+    all_games = []
+    all_bits = []
+    while len(words):
+        lowest = words & (~words + _ONE)
+        all_games.append(games)
+        all_bits.append(lowest)
+        words = words ^ lowest
+        left = words != 0
+        games = games[left]
+        words = words[left]
+    return np.concatenate(all_games), np.concatenate(all_bits)
+
+def _play_steps(boards, games, steps, player, layout, rng):
+    """
+    Makes a uniformly random step (non-capturing move) on each given board.
+
+    Parameters:
+        (np.ndarray) boards: positions (changed in place)
+        (np.ndarray) games: the boards to move on
+        (np.ndarray) steps: their step masks (see move_masks)
+        (int) player: 0 for black, 1 for red
+        (_Layout) layout: the board's layout
+        (np.random.Generator) rng: the random generator
+
+    Returns:
+        (np.ndarray): whether each moving piece was a king
+    """
+    counts = _popcount(steps).astype(np.int64)
+    ends = np.cumsum(counts, axis = 0)
+    ranks = (rng.random(len(games)) * ends[-1]).astype(np.int64)
+    directions = (ranks[None, :] >= ends).sum(axis = 0)
+    columns = np.arange(len(games))
+    ranks -= ends[directions, columns] - counts[directions, columns]
+    origins = _select_bits(steps[directions, columns], ranks)
+
+    destinations = np.zeros(len(games), np.uint64)
+    for k, shift in enumerate(layout.shifts):
+        chosen = directions == k
+        destinations[chosen] = _shift(origins[chosen], shift)
+    kings = (boards[2 * player + 1, games] & origins) != 0
+    _finish_move(boards, games, origins, destinations, player, layout)
+    return kings
+
+def _play_jumps(boards, games, jumps, player, layout, rng):
+    """
+    Makes a uniformly random complete capture on each given board: every
+    jump sequence a piece could make is listed, then one is picked per board.
+
+    Parameters:
+        (np.ndarray) boards: positions (changed in place)
+        (np.ndarray) games: the boards to move on
+        (np.ndarray) jumps: their jump masks (see move_masks)
+        (int) player: 0 for black, 1 for red
+        (_Layout) layout: the board's layout
+        (np.random.Generator) rng: the random generator
+
+    Returns: None
+    """
+    kings = boards[2 * player + 1, games]
+    opponents = boards[2 - 2 * player, games] | boards[3 - 2 * player, games]
+    # The moving piece stays on its square until the move ends, as in
+    # CheckerBoard, so it can't land where it started
+    empty = layout.valid & ~(boards[2 * player, games] | kings | opponents)
+
+    # Partial jump sequences: the entry of their game in games, the square
+    # they started and are on, the pieces they captured and whether the
+    # piece is a king
+    paths, origins = _split_bits(np.arange(len(games)),
+                                 np.bitwise_or.reduce(jumps, axis = 0))
+    current = origins
+    captured = np.zeros(len(paths), np.uint64)
+    is_king = (origins & kings[paths]) != 0
+
+    finished = []
+    while len(paths):
+        extended = []
+        going_on = np.zeros(len(paths), bool)
+        capturable = opponents[paths] & ~captured
+        free = empty[paths]
+        for shift in layout.shifts:
+            over = _shift(current, shift) & capturable
+            land = _shift(current, 2 * shift) & free
+            ok = (over != 0) & (land != 0)
+            if (shift > 0) != (player == 0):
+                # Only kings capture backwards
+                ok &= is_king
+            going_on |= ok
+            extended.append((paths[ok], origins[ok], land[ok],
+                             captured[ok] | over[ok], is_king[ok]))
+        done = ~going_on & (captured != 0)
+        finished.append((paths[done], origins[done], current[done],
+                         captured[done]))
+        paths, origins, current, captured, is_king = (
+            np.concatenate(parts) for parts in zip(*extended))
+
+    paths, origins, current, captured = (np.concatenate(parts)
+                                         for parts in zip(*finished))
+
+    # Picks one complete sequence per board at random, from the sequences
+    # sorted by board
+    order = np.argsort(paths, kind = "stable")
+    counts = np.bincount(paths, minlength = len(games))
+    firsts = np.cumsum(counts) - counts
+    chosen = order[firsts + (rng.random(len(games)) * counts).astype(np.int64)]
+
+    opponent = 1 - player
+    taken = ~captured[chosen]
+    boards[2 * opponent, games] &= taken
+    boards[2 * opponent + 1, games] &= taken
+    _finish_move(boards, games, origins[chosen], current[chosen], player,
+                 layout)
+
+def _finish_move(boards, games, origins, destinations, player, layout):
+    """
+    Moves pieces from their origins to their destinations, crowning men
+    that end on the far row.
+
+    Parameters:
+        (np.ndarray) boards: positions (changed in place)
+        (np.ndarray) games: the boards being moved on
+        (np.ndarray) origins, destinations: the squares' bits
+        (int) player: 0 for black, 1 for red
+        (_Layout) layout: the board's layout
+
+    Returns: None
+    """
+    men = boards[2 * player, games]
+    kings = boards[2 * player + 1, games]
+    is_king = ((kings & origins) != 0) | ((destinations
+                                           & layout.far_rows[player]) != 0)
+    boards[2 * player, games] = (men & ~origins) | np.where(is_king, 0,
+                                                             destinations)
+    boards[2 * player + 1, games] = (kings & ~origins) | np.where(
+        is_king, destinations, 0)
+
+def play_random_moves(boards, player, layout, rng, steps = None, jumps = None):
+    """
+    Makes one random legal move for player on every board, picking
+    uniformly among the available steps, or among the complete captures if
+    any capture is possible, as a random Bot does.
+
+    Parameters:
+        (np.ndarray) boards: positions, every one with a legal move for
+            player (changed in place)
+        (int) player: 0 for black, 1 for red
+        (_Layout) layout: the board's layout
+        (np.random.Generator) rng: the random generator
+        (np.ndarray) steps, jumps: the boards' move masks, if already known
+            (see move_masks)
+
+    Returns:
+        (np.ndarray): whether each move was quiet, moving a king without
+            capturing (see the no-progress rule of CheckerBoard)
+    """
+    if steps is None:
+        steps, jumps = move_masks(boards, player, layout)
+    capturing = np.bitwise_or.reduce(jumps, axis = 0) != 0
+    quiet = np.zeros(boards.shape[1], bool)
+
+    games = np.nonzero(~capturing)[0]
+    if len(games):
+        quiet[games] = _play_steps(boards, games, steps[:, games], player,
+                                   layout, rng)
+    games = np.nonzero(capturing)[0]
+    if len(games):
+        _play_jumps(boards, games, jumps[:, games], player, layout, rng)
+    return quiet
+
+def material(boards):
+    """
+    Counts each board's black pieces minus its red pieces.
+
+    Parameters:
+        (np.ndarray) boards: positions
+
+    Returns:
+        (np.ndarray): the material difference of each board
+    """
+    black = _popcount(boards[BLACK_MEN] | boards[BLACK_KINGS])
+    red = _popcount(boards[RED_MEN] | boards[RED_KINGS])
+    return black.astype(np.int64) - red.astype(np.int64)
+
+def position_hashes(boards):
+    """
+    Hashes each board's position, mixing its four bitboards into one word.
+    Positions with different players to move get the same hash, so only
+    compare hashes from plies of the same parity.
+
+    Parameters:
+        (np.ndarray) boards: positions
+
+    Returns:
+        (np.ndarray): uint64 array of hashes
+    """
+    hashes = np.zeros(boards.shape[1], np.uint64)
+    for words, key in zip(boards, _HASH_KEYS):
+        hashes ^= words * key
+        hashes ^= hashes >> np.uint64(31)
+    return hashes
+
+def _count_repeats(hashes, past, quiet):
+    """
+    Counts how many times each board's position came up before with the same
+    player to move. Only positions since the last capture or man move can
+    repeat, so the search goes back quiet plies at most.
+
+    Parameters:
+        (np.ndarray) hashes: the positions' hashes (see position_hashes)
+        (list[np.ndarray]) past: the hashes of earlier plies, most recent
+            first, going back at least as far as the largest quiet count
+        (np.ndarray) quiet: how many quiet moves in a row led to each board
+
+    Returns:
+        (np.ndarray): the number of earlier occurrences of each position
+    """
+    repeats = np.zeros(len(hashes), np.int64)
+    # A position needs at least four plies to come back
+    games = np.nonzero(quiet >= 4)[0]
+    lag = 4
+    while len(games):
+        repeats[games] += past[lag - 1][games] == hashes[games]
+        lag += 2
+        games = games[quiet[games] >= lag]
+    return repeats
+
+# (tuple[np.uint64]): odd multipliers for position_hashes
+_HASH_KEYS = (np.uint64(0x9E3779B97F4A7C15), np.uint64(0xBF58476D1CE4E5B9),
+              np.uint64(0x94D049BB133111EB), np.uint64(0xD6E8FEB86659FD93))
+
+# (tuple[str]): why a batch game ended, by the codes play_random_games uses
+_REASONS = ("no-moves", "repetition", "no-progress", "turn-limit")
+
+def play_random_games(n, board_size, turn_limit = -1, seed = None,
+                      batch = 65536, no_progress = None):
+    """
+    Plays games between two random bots in lockstep batches, yielding a
+    record for each game in the format of play_game in bot.py (bot 1 is
+    black in even games and red in odd games). Records of a batch are
+    yielded as its games end, in no particular order.
+
+    Parameters:
+        (int) n: the number of games to play
+        (int) board_size: the number of rows of pieces each player has (at
+            most MAX_ROWS)
+        (int) turn_limit: ends a game early if turn_limit is reached. Default
+            of -1 means no turn limit
+        (int) seed: seed for the random generator
+        (int) batch: how many games to advance together
+        (int) no_progress: if given, games are drawn once this many moves in
+            a row have neither captured a piece nor moved a man
+
+    Returns:
+        (generator[dict]): the game records (without timings)
+    """
+    layout = _get_layout(board_size)
+    rng = np.random.default_rng(seed)
+    for first in range(0, n, batch):
+        ids = np.arange(first, min(first + batch, n))
+        boards = new_boards(len(ids), board_size)
+        # Quiet moves in a row before each board, and the position hashes of
+        # the plies they span (most recent first)
+        quiet = np.zeros(len(ids), np.int64)
+        past = []
+        player = 0
+        turns = 0
+        while True:
+            steps, jumps = move_masks(boards, player, layout)
+            mover_can = np.bitwise_or.reduce(steps | jumps, axis = 0) != 0
+            other_can = can_move(boards, 1 - player, layout)
+            black_can = mover_can if player == 0 else other_can
+            red_can = other_can if player == 0 else mover_can
+            hashes = position_hashes(boards)
+
+            # The same order of checks as CheckerBoard.game_over, then the
+            # turn limit
+            reasons = np.full(len(ids), -1)
+            if no_progress is not None:
+                reasons[quiet >= no_progress] = 2
+            reasons[_count_repeats(hashes, past, quiet) >= 2] = 1
+            reasons[~(black_can & red_can)] = 0
+            if turn_limit != -1 and turns >= turn_limit:
+                reasons[reasons == -1] = 3
+            finished = reasons != -1
+            if finished.any():
+                # Who won by blocking, from black's view (0 if both are stuck
+                # or both can still move)
+                blocked = np.where(black_can == red_can, 0,
+                                   np.where(black_can, 1, -1))
+                yield from _records(ids[finished], reasons[finished],
+                                    blocked[finished],
+                                    material(boards[:, finished]), turns)
+                left = ~finished
+                ids = ids[left]
+                if len(ids) == 0:
+                    break
+                boards = boards[:, left]
+                steps = steps[:, left]
+                jumps = jumps[:, left]
+                quiet = quiet[left]
+                hashes = hashes[left]
+                past = [earlier[left] for earlier in past]
+
+            moved_king = play_random_moves(boards, player, layout, rng, steps,
+                                           jumps)
+            quiet = np.where(moved_king, quiet + 1, 0)
+            past.insert(0, hashes)
+            del past[quiet.max():]
+            player = 1 - player
+            turns += 1
+
+def _records(ids, reasons, blocked, diffs, turns):
+    """
+    Builds the records of games that finished together.
+
+    Parameters:
+        (np.ndarray) ids: the games' indices
+        (np.ndarray) reasons: why each game ended (indices into _REASONS)
+        (np.ndarray) blocked: 1 if black won by blocking red, -1 if red won
+            by blocking black, 0 otherwise
+        (np.ndarray) diffs: black's pieces minus red's pieces
+        (int) turns: how many moves were made
+
+    Returns:
+        (generator[dict]): the records
+    """
+    bot1_signs = np.where(ids % 2 == 0, 1, -1)
+    materials = bot1_signs * diffs
+    # Draws by repetition or the no-progress rule stay draws, and a player
+    # who can't move loses; otherwise material decides
+    drawn = (reasons == 1) | (reasons == 2)
+    on_material = ~drawn & (blocked == 0)
+    outcomes = np.where(drawn, 0, np.where(on_material, materials,
+                                           bot1_signs * blocked))
+    for i, sign, reason, decided_on_material, outcome, diff in zip(
+            ids.tolist(), bot1_signs.tolist(), reasons.tolist(),
+            on_material.tolist(), outcomes.tolist(), materials.tolist()):
+        yield {"game": i,
+               "bot1_color": "black" if sign == 1 else "red",
+               "bot2_color": "red" if sign == 1 else "black",
+               "winner": ("bot1" if outcome > 0 else "bot2" if outcome < 0
+                          else None),
+               "reason": _REASONS[reason],
+               "on_material": decided_on_material, "plies": turns,
+               "opening_plies": 0, "material": diff, "time": None}
@@ -3,19 +3,34 @@ Bot for checkers
 """
 import random
 import math
-import copy
+import json
+import multiprocessing
+import time
 
 import click
 import warnings
 
 from checkers import CheckerBoard
+from evaluation import load_weights, evaluate
+from mcts import MCTSBot
+from archive import ArchiveWriter
+from records import RecordWriter, save_checkpoint, load_checkpoint
+from stats import sprt_bounds, sprt_llr
+from progress import ProgressLine
+from openings import load_openings, apply_opening, generate_openings
+
+class SearchAborted(Exception):
+    """
+    Raised inside a search when the bot has used up its node budget
+    """
 
 class Bot:
     """
     Adjustable bot that picks moves based on a skill and lookahead depth
     """
 
-    def __init__(self, board, color, skill = 1, depth = 1):
+    def __init__(self, board, color, skill = 1, depth = 1, weights = None,
+                 max_nodes = None):
         """
         Constructor
         
@@ -24,6 +39,10 @@ class Bot:
             (str) color: bot's color
             (float) skill: bot's skill level from 0 to 1
             (int) depth: how many turns ahead the bot will look (default is 1)
+            (str) weights: file to load evaluation weights from (default is
+                weights.json, see evaluation.py)
+            (int) max_nodes: the most positions the bot may search per move
+                (default is no limit)
         """
         # (Board): the board for the bot to play on
         self._board = board
@@ -41,18 +60,40 @@ class Bot:
         # (int): the bot's lookahead depth in picking moves, independent of skill
         self._depth = depth
 
+        # (tuple[float, ...]): the weight of each evaluation feature
+        self._weights = load_weights(board.get_size(), weights)
+
+        # (int): the node budget per move, or None for no limit
+        self._max_nodes = max_nodes
+
+        # (int): how many nodes the current (or last) search has visited
+        self._nodes = 0
+
+        # (threading.Event): set by another thread to make the current
+        # search stop early, or None
+        self._stop = None
+
+        # (Move): the best move the current (or last) search has found so far
+        self._best = None
+
     # Wrapper method to only return the best move and not its associated heuristic
-    def suggest_move(self):
+    def suggest_move(self, stop = None):
         """
-        Constructs a tree of possible moves (storing the tree between calls had too
-        many bugs and could not be safely implemented in time) and then picks the
-        "best" move, subject to faulty decision making if at a skill < 1
+        Searches the possible moves with alpha-beta pruning and then picks the
+        "best" move, subject to faulty decision making if at a skill < 1.
+        A bot of skill 0.5 randomly chooses among the best 50% of moves, so
+        only the moves it could pick need exact scores (see _multipv_search)
 
-        Parameters: None
+        Parameters:
+            (threading.Event) stop: if given, setting it from another thread
+                ends the search early, keeping the result of the deepest
+                search that finished (like running out of node budget)
 
         Returns:
             (Move): the bot's chosen move!
         """
+        self._nodes = 0
+        self._best = None
         possible = self._board.get_player_moves(self._color)
         if len(possible) == 0:
             return None
@@ -61,167 +102,204 @@ class Bot:
         if self._skill == 0:
             return random.choice(list(possible))
 
-        tree = self._get_tree_from(self._board, self._depth, self._color)
+        cutoff = min(math.floor(self._skill * len(possible)), len(possible) - 1)
+        k = len(possible) - cutoff
+
+        # Search the moves that look best first, so bounds tighten early
+        ordered = []
+        for move in possible:
+            self._board.perform_move(move)
+            ordered.append((self._get_heuristic(self._board), move))
+            self._board.undo_move()
+        ordered.sort(key = lambda pair: pair[0], reverse = True)
+        top = ordered[:k]
+        self._best = top[0][1]
+
+        # With a node budget or a stop event, deepen one move pair at a time
+        # and keep the result of the deepest search that finished in time
+        if self._max_nodes is None and stop is None:
+            depths = [self._depth]
+        else:
+            depths = range(1, self._depth + 1)
+        self._stop = stop
+        history_length = self._board.get_history_length()
+        for depth in depths:
+            try:
+                top = self._multipv_search([move for _, move in ordered],
+                                           k, depth)
+            except SearchAborted:
+                while self._board.get_history_length() > history_length:
+                    self._board.undo_move()
+                break
+            best = {id(move) for _, move in top}
+            ordered = top + [pair for pair in ordered if id(pair[1]) not in best]
+            self._best = top[0][1]
+        self._stop = None
 
-        return tree.best_move(self._skill).get_move()
-    
+        return random.choice(top)[1]
 
-    def _get_tree_from(self, board, depth, player, move = None):
+    def _multipv_search(self, moves, k, depth):
         """
-        Recursively creates a tree of TNode objects each representing possible
-        future moves and returns the root.
+        Finds the k best moves for the bot along with their exact minimax
+        values. Each move after the first k is searched with the k-th best
+        value so far as its lower bound, so moves that can't make the top k
+        are cut off as soon as that is proven instead of being scored exactly.
+
+        Parameters:
+            (list[Move]) moves: the bot's possible moves, most promising first
+            (int) k: how many moves need exact values
+            (int) depth: how many bot-opponent move pairs to look at
+
+        Returns:
+            (list[tuple[float, Move]]): the k best moves and their values,
+                best first
+        """
+        board = self._board
+
+        top = []
+        for move in moves:
+            alpha = top[-1][0] if len(top) == k else -math.inf
+            board.perform_move(move)
+            value = self._search(board, depth, self._opp_color,
+                                 alpha, math.inf)
+            board.undo_move()
+            if len(top) < k or value > alpha:
+                top.append((value, move))
+                top.sort(key = lambda pair: pair[0], reverse = True)
+                del top[k:]
+
+        return top
+
+    def _search(self, board, depth, player, alpha, beta):
+        """
+        Recursively computes the minimax value of the board using alpha-beta
+        pruning, assuming the opponent plays optimally. Values that fall
+        outside of (alpha, beta) are only bounds: a value <= alpha means the
+        true value is at most that, and a value >= beta means it is at least
+        that.
 
         Parameters:
             (Board) board: the board to test different moves on
             (int) depth: how many more bot-opponent move pairs
                 should it look at before stopping
-            (str) player: whose moves is it looking at for the next
-                layer of the tree ("black" or "red")
+            (str) player: whose move it is ("black" or "red")
+            (float) alpha: the value the bot is already guaranteed
+            (float) beta: the value the opponent is already guaranteed
+
+        Returns:
+            (float): the board's value, positive meaning the bot is favored
         """
-        possible_moves = board.get_player_moves(player)
-        tree = TNode(move, self._get_heuristic(board), player == self._opp_color)
+        self._nodes += 1
+        if self._max_nodes is not None and self._nodes > self._max_nodes:
+            raise SearchAborted()
+        # The stop event is only checked now and then, as it is much slower
+        # to read than the node count
+        if (self._stop is not None and self._nodes % 256 == 0
+                and self._stop.is_set()):
+            raise SearchAborted()
+
+        if depth == 0:
+            return self._get_heuristic(board)
 
+        possible_moves = board.get_player_moves(player)
         if len(possible_moves) == 0:
-            tree.value = -math.inf
-            return tree
-
-        if depth > 0:
+            # A player who cannot move loses
+            return -math.inf if player == self._color else math.inf
+
+        # Try the moves that capture the most pieces first
+        ordered = sorted(possible_moves, reverse = True,
+                         key = lambda move: len(move.get_captured()))
+
+        if player == self._color:
+            value = -math.inf
+            for move in ordered:
+                board.perform_move(move)
+                value = max(value, self._search(board, depth,
+                                                self._opp_color, alpha, beta))
+                board.undo_move()
+                alpha = max(alpha, value)
+                if alpha >= beta:
+                    break
+        else:
             #Update the depth
-            if player == self._opp_color:
-                depth -= 1
-
-            #Update the player
-            player = "black" if player == "red" else "red"
-            
-            #For each move, make it and recurse
-            for move in possible_moves:
-                #Update the board
-                future = copy.deepcopy(board)
-                future.perform_move(move)
-                
-                child = self._get_tree_from(future, depth, player, move)
-
-                tree.add_child(child)
-
-        return tree
+            depth -= 1
+            value = math.inf
+            for move in ordered:
+                board.perform_move(move)
+                value = min(value, self._search(board, depth, self._color,
+                                                alpha, beta))
+                board.undo_move()
+                beta = min(beta, value)
+                if alpha >= beta:
+                    break
+
+        return value
     
     def _get_heuristic(self, board):
         """
         Returns a static evaluation of the board based on some heuristic.
-        In this case, it simply counts the number of each player's pieces,
-        weighing kings more highly than other piees. Can be tuned further
-        to value certain board positions higher if desired.
+        Material is weighed together with positional terms (advancement,
+        back-rank guard, center control and king mobility) looked up in
+        per-size piece-square tables. The board keeps running sums of
+        these terms, so this does not need to scan the grid.
 
         Parameters:
             (CheckerBoard) board: the board to evaluate
 
         Returns:
-            (int): an evaluation of the board's state, positive meaning
+            (float): an evaluation of the board's state, positive meaning
                 the bot is favored over its opponent
         """
-        grid = board.get_grid()
-        size = len(grid) #board.get_size()
-        bot_pieces = 0
-        opp_pieces = 0
-
-        for i in range(size):
-            for j in range(size):
-                piece = grid[i][j]
-                if piece is not None:
-                    if piece.get_color() == self._color:
-                        bot_pieces += 2 if piece.get_is_king() else 1
-                    else:
-                        opp_pieces += 2 if piece.get_is_king() else 1
-
-        return bot_pieces - opp_pieces
+        return evaluate(board, self._color, self._weights)
     
-    def get_color(self):
-        return self._color
-
-"""
-Helper class for trees of possible bot moves
-"""
-
-class TNode:
-    """
-    Helpful "node" class for storing moves along with values, in order to construct a tree
-    """
-    def __init__(self, move, value, is_bot):
-        """
-        Constructor
+    def get_nodes(self):
+        return self._nodes
 
-        Parameters:
-            (Move) move: the move associated with this node of the tree
-            (int) value: the initial heuristic assigned to the move
-            (bool) is_bot: whether the move was made by the bot or its
-                opponent, determines how the minimax algorithm will run
+    def get_best_move(self):
         """
-        self._move = move
-        self._value = value
-        self._is_bot = is_bot
-        self._children = []
-
-    def pull_values(self):
-        """
-        Recursively updates the heuristic value associated with itself and each of
-        its children using minimax algorithm (assuming opponent plays optimally)
+        Returns the move the current search would play if it stopped now
+        (the best move of the deepest finished search, or of the static
+        ordering before any search finishes). Safe to call from another
+        thread while suggest_move runs.
 
         Parameters: None
 
         Returns:
-            (int): the move's recalculated value (only used recursively)
-        """
-        if len(self._children) > 0:
-            #If node is the bot's move, pick minimum of values (opponent's best move)
-            if self._is_bot:
-                self._value = min(self._children, key = lambda node: node.pull_values()).get_value()
-            else:
-                self._value = max(self._children, key = lambda node: node.pull_values()).get_value()
-
-        return self._value
-    
-    def best_move(self, skill):
-        """
-        Picks from the set of possible moves (the node's children) based on a
-        given "skill". For instance, a bot of skill 0.5 will randomly choose
-        among the best 50% of moves, a bot of skill 1.0 will always choose the
-        best move, and a bot of skill 0 will choose entirely randomly.
-
-        Parameters:
-            (float) skill: determines how randomly the bot will choose
-
-        Returns:
-            (Move): the chosen "best" move (based on skill)
+            (Move): the best move so far, or None if there is none yet
         """
-        self.pull_values()
-        children_by_weight = sorted(self._children, key = lambda node: node.get_value())
-
-        cutoff = min(math.floor(skill * (len(children_by_weight))),\
-            len(children_by_weight) - 1)
-
-        return random.choice(children_by_weight[cutoff:])
-    
-    def add_child(self, node):
-        self._children.append(node)
+        return self._best
 
-    def get_move(self):
-        return self._move
-    
-    def get_value(self):
-        return self._value
-    
-    def __str__(self):
-        if self.get_move() is None:
-            return str("ROOT")
-        return str(f"Move: {self.get_move().get_steps()}, Value: {self.get_value()}")
-    
-    def __repr__(self):
-        return str(self)
+    def get_color(self):
+        return self._color
 
 """
 Simulation Code
 """
 
+def make_bot(board, color, config):
+    """
+    Creates a bot from a configuration
+
+    Parameters:
+        (Board) board: the board for the bot to play on
+        (str) color: the bot's color
+        (tuple[int, int] or dict) config: either the skill and depth of a
+            Bot, or a dict holding an "engine" ("minimax" or "mcts") along
+            with keyword arguments for that engine's constructor
+
+    Returns:
+        (Bot or MCTSBot): the new bot
+    """
+    if isinstance(config, dict):
+        options = dict(config)
+        engine = options.pop("engine", "minimax")
+        if engine == "mcts":
+            return MCTSBot(board, color, **options)
+        if engine == "minimax":
+            return Bot(board, color, **options)
+        raise ValueError(f"unknown engine '{engine}'")
+    return Bot(board, color, config[0], config[1])
+
 def get_material(board, player):
         """
         Returns the number of piees a player has minus
@@ -234,129 +312,510 @@ def get_material(board, player):
         Returns:
             (int): input player's pieces minus their opponent's pieces
         """
-        grid = board.get_grid()
-        size = len(grid)
-        bot_pieces = 0
-        opp_pieces = 0
-
-        for i in range(size):
-            for j in range(size):
-                piece = grid[i][j]
-                if piece is not None:
-                    if piece.get_color() == player:
-                        bot_pieces += 1
-                    else:
-                        opp_pieces += 1
+        opp_player = "black" if player == "red" else "red"
+        bot_pieces = board.get_men_count(player) + board.get_king_count(player)
+        opp_pieces = (board.get_men_count(opp_player)
+                      + board.get_king_count(opp_player))
 
         return bot_pieces - opp_pieces
 
-def simulate(board, n, b1 = (1, 1), b2 = (0, 0), turn_limit = -1, display_board = False):
+def play_game(start, i, b1, b2, turn_limit = -1, display_board = False,
+              seed = None, openings = None, keep_moves = False):
     """
-    Simulates multiple games between two bots
+    Plays a single game between two bots
 
     Parameters:
-        (Board) board: the board to play on
-        (int) n: the number of matches to play
-        (tuple[int, int]) b1: skill, depth of bot 1
-        (tuple[int, int]) b2: skill, depth of bot 2
-        (int) turn_limit: ends game early and judges winner based on number of pieces
-        remaining if turn_limit is reached. Default of -1 means no turn limit
+        (Board) start: the board to start from (it is copied, not played on)
+        (int) i: the game's index, which decides the colors (bot 1 is black
+            in even games and red in odd games)
+        (tuple[int, int] or dict) b1: configuration of bot 1 for make_bot
+        (tuple[int, int] or dict) b2: configuration of bot 2 for make_bot
+        (int) turn_limit: ends game early if turn_limit is reached. Default of
+            -1 means no turn limit
+        (bool) display_board: whether to print the board after every move
+        (int) seed: if given, the game's random choices are seeded from this
+            seed and the game's index, so the game can be replayed exactly
+        (list[str]) openings: if given, the game starts after one of these
+            openings (see openings.py). Games 2k and 2k + 1 play opening k
+            (wrapping around), so each opening is played once with each
+            color assignment
+        (bool) keep_moves: whether to add every move of the game, opening
+            included, to the record ("moves", as lists of squares)
 
     Returns:
-        (float): the proportion of games won by bot1
+        (dict): the game's record, holding its index ("game"), each bot's
+            color ("bot1_color" and "bot2_color"), the winner ("bot1", "bot2"
+            or None for a tie), why the game ended ("reason": "no-moves",
+            "repetition", "no-progress" or "turn-limit"), whether it was decided on material
+            ("on_material"), how many moves the bots made ("plies") and
+            how many the opening made before them ("opening_plies"), bot 1's
+            material advantage ("material"), how many seconds the game
+            took ("time") and how many of them the bots spent choosing moves
+            ("search_time")
     """
-    b1wins = 0
-    b2wins = 0
-    material_sum = 0
-    reset = copy.deepcopy(board)
-    for i in range(n):
-        # Reset the board
-        board = copy.deepcopy(reset)
-        turns = 0
-
-        # Initialize bots and assign colors (alternates between games)
-        if i % 2 == 0:
-            bot1 = Bot(board, "black", b1[0], b1[1])
-            bot2 = Bot(board, "red", b2[0], b2[1])
-            current = bot1
-        else:
-            bot1 = Bot(board, "red", b1[0], b1[1])
-            bot2 = Bot(board, "black", b2[0], b2[1])
+    started = time.perf_counter()
+    if seed is not None:
+        random.seed(f"{seed}:{i}")
+
+    # Reset the board
+    board = start.clone()
+    turns = 0
+    search_time = 0.0
+    to_move = "black"
+    opening_plies = 0
+    if openings:
+        opening = openings[(i // 2) % len(openings)]
+        to_move = apply_opening(board, opening)
+        opening_plies = len(opening.split())
+
+    # Initialize bots and assign colors (alternates between games)
+    if i % 2 == 0:
+        bot1 = make_bot(board, "black", b1)
+        bot2 = make_bot(board, "red", b2)
+    else:
+        bot1 = make_bot(board, "red", b1)
+        bot2 = make_bot(board, "black", b2)
+    current = bot1 if bot1.get_color() == to_move else bot2
+
+    if display_board:
+        print(board._board)
+
+    # While the game isn't over, make a move
+    while board.game_over() is None:
+        # If turn limit has been reached, end game early
+        if turn_limit != -1 and turns >= turn_limit:
+            break
+
+        thinking = time.perf_counter()
+        move = current.suggest_move()
+        search_time += time.perf_counter() - thinking
+        board.perform_move(move)
+
+        # Update whose turn it is
+        if current == bot1:
             current = bot2
+        else:
+            current = bot1
 
         if display_board:
             print(board._board)
 
-        # While the game isn't over, make a move
-        while board.game_over() is None:
-            # If turn limit has been reached, end game early
-            if turn_limit != -1 and turns >= turn_limit:
-                break
+        turns += 1
+
+    material = get_material(board, bot1.get_color())
+
+    # Without a winner, the bot with more pieces wins, except that draws by
+    # repetition or the no-progress rule stay draws
+    winner = board.game_over()
+    reason = board.get_end_reason() or "turn-limit"
+    on_material = False
+    if winner == bot1.get_color():
+        winner = "bot1"
+    elif winner == bot2.get_color():
+        winner = "bot2"
+    elif reason in ("repetition", "no-progress"):
+        winner = None
+    else:
+        on_material = True
+        if material > 0:
+            winner = "bot1"
+        elif material < 0:
+            winner = "bot2"
+        else:
+            winner = None
+
+    record = {"game": i, "bot1_color": bot1.get_color(),
+              "bot2_color": bot2.get_color(), "winner": winner,
+              "reason": reason, "on_material": on_material, "plies": turns,
+              "opening_plies": opening_plies,
+              "material": material, "time": time.perf_counter() - started,
+              "search_time": search_time}
+    if keep_moves:
+        record["moves"] = [list(move.get_steps())
+                           for move in board.get_move_history()]
+    return record
+
+# (tuple): the arguments shared by every game a pool worker plays, set by
+# _init_worker
+_worker_game = None
+
+def _init_worker(start, b1, b2, turn_limit, seed, openings, keep_moves):
+    """
+    Stores the shared game arguments in a pool worker process
 
-            move = current.suggest_move()
-            board.perform_move(move)
+    Parameters:
+        See play_game
 
-            # Update whose turn it is
-            if current == bot1:
-                current = bot2
-            else:
-                current = bot1
+    Returns: None
+    """
+    global _worker_game
+    _worker_game = (start, b1, b2, turn_limit, seed, openings, keep_moves)
 
-            if display_board:
-                print(board._board)
+def _play_worker_game(i):
+    """
+    Plays game i in a pool worker process
 
-            turns += 1
+    Parameters:
+        (int) i: the game's index
+
+    Returns:
+        (dict): the game's record (see play_game)
+    """
+    start, b1, b2, turn_limit, seed, openings, keep_moves = _worker_game
+    return play_game(start, i, b1, b2, turn_limit, seed = seed,
+                     openings = openings, keep_moves = keep_moves)
 
-        material = get_material(board, bot1._color)
+def iter_games(board, n, b1 = (1, 1), b2 = (0, 0), turn_limit = -1,
+               display_board = False, workers = 1, seed = None, first = 0,
+               openings = None, keep_moves = False):
+    """
+    Plays multiple games between two bots, yielding each game's record as
+    soon as it is finished (see play_game for the parameters and records)
 
-        # If there is a winner, print it and add one to that bot's tally
-        winner = board.game_over()
-        if winner == bot1.get_color():
-            b1wins += 1
-            print(f"Game {i} complete, Bot 1 won!")
-        elif winner == bot2.get_color():
-            b2wins += 1
-            print(f"Game {i} complete, Bot 2 won!")
-        else:
-            if material > 0:
+    Parameters:
+        (int) n: the number of matches to play
+        (int) workers: how many processes to play games in
+        (int) first: the index of the first game to play, for continuing
+            an interrupted run
+        (other): see play_game
+
+    Returns:
+        (generator[dict]): the records, in game order
+    """
+    if workers > 1 and display_board:
+        raise ValueError("display_board requires a single worker")
+
+    if workers == 1:
+        for i in range(first, n):
+            yield play_game(board, i, b1, b2, turn_limit, display_board, seed,
+                            openings, keep_moves)
+        return
+
+    pool = multiprocessing.Pool(workers, _init_worker,
+                                (board, b1, b2, turn_limit, seed, openings,
+                                 keep_moves))
+    try:
+        # imap hands back records in game order, like the serial path
+        yield from pool.imap(_play_worker_game, range(first, n))
+    finally:
+        pool.terminate()
+
+def archive_game(archiver, side, b1, b2, record, moves):
+    """
+    Appends a simulated game to a game archive, naming each bot after its
+    configuration
+
+    Parameters:
+        (ArchiveWriter) archiver: the archive to write to
+        (int) side: the board's side length
+        (tuple[int, int] or dict) b1: configuration of bot 1
+        (tuple[int, int] or dict) b2: configuration of bot 2
+        (dict) record: the game's record (see play_game)
+        (list[list[tuple[int, int]]]) moves: the game's moves
+
+    Returns: None
+    """
+    names = {record["bot1_color"]: json.dumps(b1, separators = (",", ":")),
+             record["bot2_color"]: json.dumps(b2, separators = (",", ":"))}
+    if record["winner"] is None:
+        winner = "draw"
+    else:
+        winner = record[record["winner"] + "_color"]
+    archiver.write_game(side, names["black"], names["red"], winner,
+                        record["reason"], moves)
+
+def simulate(board, n, b1 = (1, 1), b2 = (0, 0), turn_limit = -1,
+             display_board = False, workers = 1, seed = None, output = None,
+             sprt = None, checkpoint = None, checkpoint_every = 10,
+             resume = False, openings = None, archive = None, quiet = False,
+             listen = None, local_workers = 0, games_per_batch = 10,
+             worker_timeout = 60):
+    """
+    Simulates multiple games between two bots
+
+    Parameters:
+        (Board) board: the board to play on
+        (int) n: the number of matches to play
+        (tuple[int, int] or dict) b1: skill, depth of bot 1, or a
+            configuration for make_bot
+        (tuple[int, int] or dict) b2: skill, depth of bot 2, or a
+            configuration for make_bot
+        (int) turn_limit: ends game early and judges winner based on number of pieces
+        remaining if turn_limit is reached. Default of -1 means no turn limit
+        (bool) display_board: whether to print the board after every move
+            (only when playing in a single process)
+        (int) workers: how many processes to play games in
+        (int) seed: if given, every game is seeded from this seed and its
+            index, so the results are the same for any number of workers
+        (str) output: if given, each game's record is written to this file
+            as soon as the game ends (CSV for ".csv" files, JSON lines
+            otherwise)
+        (tuple[float, float, float, float]) sprt: if given, the elo0, elo1,
+            alpha and beta of a sequential probability ratio test of bot 1
+            against bot 2. The match stops as soon as the test accepts H0
+            (bot 1 is elo0 stronger) or H1 (bot 1 is elo1 stronger), so n is
+            only the most games it can take
+        (str) checkpoint: if given, the running totals, the settings and
+            where the output file had got to are saved to this file every
+            checkpoint_every games, when the run ends and when it is
+            interrupted. Without a seed, the run then picks one, so the
+            games a resumed run plays do not depend on the number of workers
+        (int) checkpoint_every: how many games to play between checkpoints
+        (bool) resume: whether to continue from the checkpoint file instead
+            of starting over (the settings and output file must match the
+            checkpoint's, and the output file is continued from where the
+            checkpoint left it)
+        (list[str]) openings: if given, games start after these openings,
+            each played in a pair of games with the colors swapped (see
+            play_game)
+        (str) archive: if given, every game played is appended to this game
+            archive (see archive.py). Games played after the last checkpoint
+            of an interrupted run are archived again when it is resumed
+        (bool) quiet: whether to show a progress line, redrawn at most twice
+            a second, instead of printing every game's result
+        (tuple[str, int]) listen: if given, games are played by workers
+            that connect to this host and port instead of in local processes
+            (see distributed.py)
+        (int) local_workers: how many such workers to start on this machine
+            (with no listen address, they connect to a free local port)
+        (int) games_per_batch: how many games to hand a worker at a time
+        (float) worker_timeout: how many seconds a worker playing a batch
+            may go unheard from before the batch is given to another worker
+
+    Returns:
+        (float): the proportion of games won by bot1
+    """
+    # The settings a checkpoint must have been made with, as JSON would
+    # store them
+    config = json.loads(json.dumps({
+        "board_size": board.get_size(),
+        "no_progress": board.get_no_progress_limit(), "n": n, "b1": b1, "b2": b2,
+        "turn_limit": turn_limit, "seed": seed, "sprt": sprt,
+        "openings": openings}))
+
+    if quiet and display_board:
+        raise ValueError("display_board cannot be used in quiet mode")
+
+    # Check every opening before any games are played
+    for opening in openings or []:
+        apply_opening(board.clone(), opening)
+
+    first = 0
+    b1wins = 0
+    b2wins = 0
+    ties = 0
+    material_sum = 0
+    game_seed = seed
+    output_size = None
+    if resume:
+        if checkpoint is None:
+            raise ValueError("resume requires a checkpoint file")
+        saved_config, state = load_checkpoint(checkpoint)
+        if saved_config != config:
+            raise ValueError(f"{checkpoint} was made with different settings")
+        if state["output"] != output:
+            raise ValueError(f"{checkpoint} was made with --output "
+                             f"{state['output']}, so it must be resumed with it")
+        first = state["games"]
+        b1wins, b2wins = state["bot1_wins"], state["bot2_wins"]
+        ties, material_sum = state["ties"], state["material"]
+        game_seed, output_size = state["seed"], state["output_size"]
+        print(f"Resuming after {first} games from {checkpoint}")
+    elif checkpoint is not None and seed is None:
+        # Checkpointed games are always seeded, so a resumed run plays the
+        # same games an uninterrupted one would have, with any number of
+        # workers
+        game_seed = random.randrange(2 ** 32)
+
+    writer = RecordWriter(output, output_size) if output is not None else None
+    archiver = ArchiveWriter(archive) if archive is not None else None
+    progress = ProgressLine(n, live = quiet)
+    progress.restored(first)
+
+    def save():
+        # Checkpoints the totals so far
+        save_checkpoint(checkpoint, config, {
+            "games": games, "bot1_wins": b1wins, "bot2_wins": b2wins,
+            "ties": ties, "material": material_sum, "seed": game_seed,
+            "output": output,
+            "output_size": writer.tell() if writer is not None else None})
+
+    if sprt is not None:
+        elo0, elo1, alpha, beta = sprt
+        lower, upper = sprt_bounds(alpha, beta)
+        llr = sprt_llr(b1wins, ties, b2wins, elo0, elo1)
+
+    # A resumed run the test had already stopped has no games left to play
+    games = first
+    if sprt is not None and (llr <= lower or llr >= upper):
+        n = first
+
+    if listen is not None or local_workers > 0:
+        if display_board:
+            raise ValueError("display_board cannot be used with workers "
+                             "over the network")
+        # Imported here since distributed.py imports this module
+        from distributed import iter_distributed_games
+        played = iter_distributed_games(board, n, b1, b2, turn_limit,
+                                        game_seed, first, openings,
+                                        archiver is not None,
+                                        listen or ("127.0.0.1", 0),
+                                        games_per_batch, local_workers,
+                                        worker_timeout)
+    else:
+        played = iter_games(board, n, b1, b2, turn_limit, display_board,
+                            workers, game_seed, first, openings,
+                            archiver is not None)
+    try:
+        for record in played:
+            i = record["game"]
+            if archiver is not None:
+                archive_game(archiver, board.get_size(), b1, b2, record,
+                             record.pop("moves"))
+            if writer is not None:
+                writer.write(record)
+
+            # If there is a winner, print it and add one to that bot's tally
+            suffix = " on material" if record["on_material"] else ""
+            if record["winner"] == "bot1":
                 b1wins += 1
-                print(f"Game {i} complete, Bot 1 won on material!")
-            elif material < 0:
+                message = f"Game {i} complete, Bot 1 won{suffix}!"
+            elif record["winner"] == "bot2":
                 b2wins += 1
-                print(f"Game {i} complete, Bot 2 won on material!")
+                message = f"Game {i} complete, Bot 2 won{suffix}!"
             else:
-                n -= 1
-                print(f"Game {i} complete, bots tied on material!")
-        
-        material_sum += material
+                ties += 1
+                if record["reason"] == "repetition":
+                    message = f"Game {i} complete, drawn by repetition!"
+                elif record["reason"] == "no-progress":
+                    message = f"Game {i} complete, drawn by the no-progress rule!"
+                else:
+                    message = f"Game {i} complete, bots tied on material!"
+            material_sum += record["material"]
+            games += 1
+            progress.update(record, b1wins, b2wins)
+            if not quiet:
+                print(message)
+
+            if checkpoint is not None and games % checkpoint_every == 0:
+                save()
+
+            if sprt is not None:
+                llr = sprt_llr(b1wins, ties, b2wins, elo0, elo1)
+                if llr <= lower or llr >= upper:
+                    break
+    finally:
+        played.close()
+        progress.finish()
+        if checkpoint is not None:
+            save()
+        if writer is not None:
+            writer.close()
+        if archiver is not None:
+            archiver.close()
+
+    # The verdict comes after the progress line and timing summary
+    if sprt is not None:
+        if llr <= lower or llr >= upper:
+            accepted = "H1" if llr >= upper else "H0"
+            print(f"SPRT accepted {accepted} after {games} games (LLR "
+                  f"{llr:.2f}, bounds [{lower:.2f}, {upper:.2f}])")
+        else:
+            print(f"SPRT was inconclusive after {games} games (LLR "
+                  f"{llr:.2f}, bounds [{lower:.2f}, {upper:.2f}])")
 
-    return b1wins / n, material_sum / n
+    # Tied games are left out of the averages, and if every game was tied
+    # the bots count as even
+    decided = b1wins + b2wins
+    if decided == 0:
+        return 0.5, 0.0
+    return b1wins / decided, material_sum / decided
 
 """
 Command-line Interface Code
 """
 
-@click.command(name="checkers-bot")
+@click.group(name="checkers-bot", invoke_without_command=True)
 @click.option('--num-games',  type=click.INT, default=100)
 @click.option('--bot1',
-              type=click.Choice(['random', 'smart'], case_sensitive=False),
+              type=click.Choice(['random', 'smart', 'mcts'], case_sensitive=False),
               default="smart")
 @click.option('--bot2',
-              type=click.Choice(['random', 'smart'], case_sensitive=False),
+              type=click.Choice(['random', 'smart', 'mcts'], case_sensitive=False),
               default="random")
 @click.option('--b1-skill', type=click.FLOAT, default=-1)
 @click.option('--b1-depth', type=click.INT, default=1)
+@click.option('--b1-playouts', type=click.IntRange(min=1), default=None)
+@click.option('--b1-time', type=click.IntRange(min=1), default=None)
+@click.option('--b1-nodes', type=click.IntRange(min=1), default=None)
 @click.option('--b2-skill', type=click.FLOAT, default=-1)
 @click.option('--b2-depth', type=click.INT, default=1)
+@click.option('--b2-playouts', type=click.IntRange(min=1), default=None)
+@click.option('--b2-time', type=click.IntRange(min=1), default=None)
+@click.option('--b2-nodes', type=click.IntRange(min=1), default=None)
 @click.option('--board-size', type=click.INT, default=2)
 @click.option('--turn-limit', type=click.INT, default=500)
+@click.option('--no-progress', type=click.INT, default=None)
 @click.option('--display-board', type=click.BOOL, default=False)
 @click.option('--material-info', type=click.BOOL, default=True)
-
-def cmd(num_games, bot1, bot2, b1_skill, b1_depth, b2_skill, b2_depth,\
-            board_size, turn_limit, display_board, material_info):
-    board = CheckerBoard(board_size)
-    if b1_skill != -1:
+@click.option('--quiet', is_flag=True, default=False)
+@click.option('--workers', type=click.INT, default=1)
+@click.option('--listen', type=click.STRING, default=None)
+@click.option('--local-workers', type=click.INT, default=0)
+@click.option('--games-per-batch', type=click.INT, default=10)
+@click.option('--worker-timeout', type=click.FLOAT, default=60)
+@click.option('--seed', type=click.INT, default=None)
+@click.option('--output', type=click.Path(dir_okay=False), default=None)
+@click.option('--archive', type=click.Path(dir_okay=False), default=None)
+@click.option('--openings', type=click.Path(exists=True, dir_okay=False), default=None)
+@click.option('--checkpoint', type=click.Path(dir_okay=False), default=None)
+@click.option('--checkpoint-every', type=click.INT, default=10)
+@click.option('--resume', is_flag=True, default=False)
+@click.option('--sprt', is_flag=True, default=False)
+@click.option('--elo0', type=click.FLOAT, default=0)
+@click.option('--elo1', type=click.FLOAT, default=10)
+@click.option('--alpha', type=click.FLOAT, default=0.05)
+@click.option('--beta', type=click.FLOAT, default=0.05)
+@click.pass_context
+
+def cmd(ctx, num_games, bot1, bot2, b1_skill, b1_depth, b1_playouts, b1_time,\
+            b1_nodes, b2_skill, b2_depth, b2_playouts, b2_time, b2_nodes,\
+            board_size, turn_limit, no_progress, display_board, material_info,\
+            quiet, workers, listen, local_workers, games_per_batch,\
+            worker_timeout, seed,\
+            output, archive, openings, checkpoint, checkpoint_every, resume,\
+            sprt, elo0, elo1, alpha, beta):
+    if openings is not None:
+        openings = load_openings(openings)
+        if len(openings) == 0:
+            raise ValueError('the openings file has no openings')
+
+    if no_progress is not None and no_progress < 1:
+        raise ValueError('no-progress must be 1 or higher')
+
+    # Subcommands share the board and run settings
+    ctx.obj = {"board_size": board_size, "turn_limit": turn_limit,
+               "no_progress": no_progress, "workers": workers, "seed": seed,
+               "openings": openings}
+    if ctx.invoked_subcommand is not None:
+        return
+
+    board = CheckerBoard(board_size, no_progress)
+    # MCTS bots are limited by playouts or time, not by nodes
+    if bot1 == "mcts" and b1_nodes is not None:
+        raise click.BadParameter("mcts bots don't take a node budget; "
+                                 "use --b1-playouts or --b1-time",
+                                 param_hint="--b1-nodes")
+    if bot2 == "mcts" and b2_nodes is not None:
+        raise click.BadParameter("mcts bots don't take a node budget; "
+                                 "use --b2-playouts or --b2-time",
+                                 param_hint="--b2-nodes")
+    if bot1 == "mcts":
+        # Without any budget, MCTS bots run 200 playouts per move
+        if b1_playouts is None and b1_time is None:
+            b1_playouts = 200
+        b1 = {"engine": "mcts", "playouts": b1_playouts, "time_ms": b1_time}
+    elif b1_skill != -1:
         if b1_skill < 0 or b1_skill > 1:
             raise ValueError('b1-skill must be between 0 and 1')
         if b1_depth < 1:
@@ -369,7 +828,11 @@ def cmd(num_games, bot1, bot2, b1_skill, b1_depth, b2_skill, b2_depth,\
             b1 = (0, 0)
         elif bot1 == "smart":
             b1 = (1, 1)
-    if b2_skill != -1:
+    if bot2 == "mcts":
+        if b2_playouts is None and b2_time is None:
+            b2_playouts = 200
+        b2 = {"engine": "mcts", "playouts": b2_playouts, "time_ms": b2_time}
+    elif b2_skill != -1:
         if b2_skill < 0 or b2_skill > 1:
             raise ValueError('b2-skill must be between 0 and 1')
         if b2_depth < 1:
@@ -383,15 +846,164 @@ def cmd(num_games, bot1, bot2, b1_skill, b1_depth, b2_skill, b2_depth,\
         elif bot2 == "smart":
             b2 = (1, 1)
 
+    # A node budget caps how much a minimax bot searches per move
+    if b1_nodes is not None and isinstance(b1, tuple):
+        b1 = {"engine": "minimax", "skill": b1[0], "depth": b1[1],
+              "max_nodes": b1_nodes}
+    if b2_nodes is not None and isinstance(b2, tuple):
+        b2 = {"engine": "minimax", "skill": b2[0], "depth": b2[1],
+              "max_nodes": b2_nodes}
+
     if board_size >= 4:
         warnings.warn('board size of 4 or higher may result in slower simulation runtime')
 
-    bot1_winrate, material_avg = simulate(board, num_games, b1, b2, turn_limit, display_board)
+    if workers < 1:
+        raise ValueError('workers must be 1 or higher')
+    if local_workers < 0:
+        raise ValueError('local-workers must be 0 or higher')
+    if games_per_batch < 1:
+        raise ValueError('games-per-batch must be 1 or higher')
+    if worker_timeout <= 0:
+        raise ValueError('worker-timeout must be greater than 0')
+    if listen is not None:
+        # Imported here since distributed.py imports this module
+        from distributed import parse_address
+        listen = parse_address(listen)
+
+    if checkpoint_every < 1:
+        raise ValueError('checkpoint-every must be 1 or higher')
+    if resume and checkpoint is None:
+        raise ValueError('resume requires --checkpoint')
+
+    if sprt:
+        if elo1 <= elo0:
+            raise ValueError('elo1 must be greater than elo0')
+        if not (0 < alpha < 1 and 0 < beta < 1):
+            raise ValueError('alpha and beta must be between 0 and 1')
+        sprt = (elo0, elo1, alpha, beta)
+    else:
+        sprt = None
+
+    bot1_winrate, material_avg = simulate(board, num_games, b1, b2, turn_limit,
+                                          display_board, workers, seed, output,
+                                          sprt, checkpoint, checkpoint_every,
+                                          resume, openings, archive, quiet,
+                                          listen, local_workers,
+                                          games_per_batch, worker_timeout)
         
     print(f"Bot1 had {100 * round(bot1_winrate, ndigits=5)}% success against bot 2")
 
     if material_info:
         print(f"Bot1 ended with {round(material_avg, ndigits=3)} more pieces on average than bot2")
 
+@cmd.command(name="tournament")
+@click.argument('config', type=click.Path(exists=True, dir_okay=False))
+@click.option('--games', type=click.INT, default=20)
+@click.pass_obj
+
+def tournament_cmd(obj, config, games):
+    """
+    Plays a round robin between the bots listed in CONFIG (a JSON file) and
+    reports their Elo ratings and a cross-table
+    """
+    # Imported here since tournament.py imports this module
+    from tournament import load_configs, run_tournament, format_results
+
+    if games < 1:
+        raise ValueError('games must be 1 or higher')
+    board = CheckerBoard(obj["board_size"], obj["no_progress"])
+    configs = load_configs(config, board)
+    if len(configs) < 2:
+        raise ValueError('a tournament needs at least two bots')
+
+    results = run_tournament(board, configs, games, obj["turn_limit"],
+                             obj["workers"], obj["seed"], obj["openings"])
+
+    print()
+    print(format_results([name for name, _ in configs], results))
+
+@cmd.command(name="openings")
+@click.argument('output', type=click.Path(dir_okay=False))
+@click.option('--plies', type=click.INT, default=3)
+@click.option('--all', 'keep_all', is_flag=True, default=False)
+@click.pass_obj
+
+def openings_cmd(obj, output, plies, keep_all):
+    """
+    Writes every opening of --plies moves on the --board-size board to
+    OUTPUT, keeping only those that leave the material even unless --all is
+    given
+    """
+    board = CheckerBoard(obj["board_size"])
+    openings = generate_openings(board, plies, balanced = not keep_all)
+    with open(output, "w") as f:
+        for opening in openings:
+            f.write(opening + "\n")
+    print(f"Wrote {len(openings)} openings to {output}")
+
+@cmd.command(name="batch")
+@click.option('--games', type=click.INT, default=10000)
+@click.option('--batch-size', type=click.INT, default=65536)
+@click.option('--output', type=click.Path(dir_okay=False), default=None)
+@click.pass_obj
+
+def batch_cmd(obj, games, batch_size, output):
+    """
+    Plays random bots against each other in large vectorized batches (needs
+    numpy) and reports the same statistics as a normal run
+    """
+    # Imported here so numpy is only needed for batch runs
+    from batch import play_random_games
+
+    if games < 1:
+        raise ValueError('games must be 1 or higher')
+    if batch_size < 1:
+        raise ValueError('batch-size must be 1 or higher')
+    if obj["openings"] is not None:
+        raise ValueError('batch runs always start from the starting position')
+
+    b1wins = 0
+    b2wins = 0
+    material_sum = 0
+    writer = RecordWriter(output) if output is not None else None
+    try:
+        for record in play_random_games(games, obj["board_size"],
+                                        obj["turn_limit"], obj["seed"],
+                                        batch_size, obj["no_progress"]):
+            if record["winner"] == "bot1":
+                b1wins += 1
+            elif record["winner"] == "bot2":
+                b2wins += 1
+            material_sum += record["material"]
+            if writer is not None:
+                writer.write(record)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    # As in simulate, tied games are left out of the averages, and if every
+    # game was tied the bots count as even
+    decided = b1wins + b2wins
+    if decided == 0:
+        bot1_winrate, material_avg = 0.5, 0.0
+    else:
+        bot1_winrate, material_avg = b1wins / decided, material_sum / decided
+    print(f"Bot1 had {100 * round(bot1_winrate, ndigits=5)}% success against bot 2")
+    print(f"Bot1 ended with {round(material_avg, ndigits=3)} more pieces on average than bot2")
+
+@cmd.command(name="worker")
+@click.option('--connect', type=click.STRING, required=True)
+@click.option('--retry', type=click.FLOAT, default=30)
+
+def worker_cmd(connect, retry):
+    """
+    Plays games for a coordinator started with --listen until it finishes
+    """
+    # Imported here since distributed.py imports this module
+    from distributed import parse_address, run_worker
+
+    played = run_worker(parse_address(connect), retry)
+    print(f"Played {played} games for {connect}")
+
 if __name__ == "__main__":
     cmd()
@@ -1,47 +1,197 @@
+import random
+
 from utils import tuple_add, tuple_subtract, tuple_avg
+from evaluation import FEATURES, get_feature_tables
+
+# (dict[int, tuple]): the location and color of every piece in the starting
+# position, along with the men counts, feature sums and hash of that
+# position, by number of rows per player
+_start_positions = {}
+
+# (dict[int, tuple]): the Zobrist keys positions are hashed with, by side
+# length (see _get_hash_keys)
+_hash_keys = {}
+
+def _get_hash_keys(size):
+    """
+    Returns the Zobrist keys for a board size, generating them the first time
+    they are asked for. A position's hash is the XOR of the keys of its
+    pieces, XORed with the turn key when it is red's turn. The keys come from
+    a generator seeded with the size, so hashes match across processes and
+    the random module's state is left alone.
+
+    Parameters:
+        size (int): the side length of the board
+
+    Returns:
+        (tuple[dict[str, dict[str, list[list[int]]]], int]): the piece keys,
+            indexed by color, then "man" or "king", then row and column, and
+            the turn key
+    """
+    if size not in _hash_keys:
+        rng = random.Random(size)
+        pieces = {color: {kind: [[rng.getrandbits(64) for _ in range(size)]
+                                 for _ in range(size)]
+                          for kind in ("man", "king")}
+                  for color in ("red", "black")}
+        _hash_keys[size] = (pieces, rng.getrandbits(64))
+    return _hash_keys[size]
 
 class CheckerBoard:
     """
     Class for representing a checkerboard.
     """
-    def __init__(self, n):
+    def __init__(self, n, no_progress_limit=None):
         """
         Constructor
 
         Parameters:
             n (int): the number of rows or pieces each player should have
+            no_progress_limit (int): if given, the game is drawn once this
+                many moves in a row have neither captured a piece nor moved
+                a man
         """
         
+        # (int): the number of rows of pieces each player starts with
+        self._n = n
+
         # (int): the side length of the board
         self._size = 2 * n + 2
 
         self._board = Board(self._size, self._size)
+
+        # (dict[str, int]): the number of men (uncrowned pieces) each color has
+        self._men = {"red": 0, "black": 0}
+        # (dict[str, int]): the number of kings each color has
+        self._kings = {"red": 0, "black": 0}
+
+        # (dict[str, dict[str, list[list[tuple[int, ...]]]]]): the positional
+        # feature tables for this board size (see evaluation.py)
+        self._tables = get_feature_tables(self._size)
+        # (dict[str, list[int]]): each color's running sum of the feature
+        # vectors of its pieces
+        self._features = {"red": [0] * len(FEATURES),
+                          "black": [0] * len(FEATURES)}
+
+        # (list[tuple[Move, list[tuple[tuple[int, int], Piece]], bool, int]]):
+        # the performed moves, along with the pieces they captured, whether
+        # they crowned the moving piece and the no-progress count before
+        # them, so that they can be undone
+        self._history = []
+
+        # (dict[str, dict[str, list[list[int]]]], int): the Zobrist keys for
+        # this board size (see _get_hash_keys)
+        self._keys, self._turn_key = _get_hash_keys(self._size)
+        # (int): the hash of the current position and whose turn it is
+        self._hash = 0
+
         self._populate_board(n)
 
+        # (dict[int, int]): how many times each position has come up since
+        # the board was created, reset or cloned, by hash
+        self._seen = {self._hash: 1}
+
+        # (int): how many moves in a row have neither captured nor moved a man
+        self._quiet = 0
+        # (int): the number of such moves that draws the game (None for no
+        # limit)
+        self._no_progress_limit = no_progress_limit
+
         # (str): the player who conceded
         self._conceded = None
 
     def _populate_board(self, n):
         """
-        Populates the board with pieces.
+        Populates an empty board with pieces.
 
         Parameters:
             n (int): the number of rows of pieces each player should have.
 
         Returns: None
         """
+        # The layout for each size is worked out once, along with the piece
+        # counts and feature sums it gives, and reused by every board and
+        # reset of that size
+        if n in _start_positions:
+            layout, men, features, position_hash = _start_positions[n]
+            grid = self._board.get_grid()
+            for (row, col), color in layout:
+                grid[row][col] = Piece(color)
+            self._men = dict(men)
+            self._features = {color: list(sums)
+                              for color, sums in features.items()}
+            self._hash = position_hash
+            return
+
+        layout = []
         # Populates the first n rows with black pieces
         for row in range(n):
             for col in range(self._size):
                 if (row + col) % 2 == 1:
-                    self._board.add_piece(Piece("black"), (row, col))
+                    layout.append(((row, col), "black"))
 
         # Populates the last n rows with red pieces
-
         for row in range(self._size - n, self._size):
             for col in range(self._size):
                 if (row + col) % 2 == 1:
-                    self._board.add_piece(Piece("red"), (row, col))
+                    layout.append(((row, col), "red"))
+
+        for loc, color in layout:
+            self._place_piece(Piece(color), loc)
+        _start_positions[n] = (layout, dict(self._men),
+                               {color: list(sums)
+                                for color, sums in self._features.items()},
+                               self._hash)
+
+    def _place_piece(self, piece, loc):
+        """
+        Adds a piece to the board and counts it towards its color's piece
+        counts, feature sums and the position's hash.
+
+        Parameters:
+            piece (Piece): the piece to add
+            loc (tuple[int, int]): the location of the new piece
+
+        Returns: None
+        """
+        self._board.add_piece(piece, loc)
+        color = piece.get_color()
+        kind = "king" if piece.get_is_king() else "man"
+        if kind == "king":
+            self._kings[color] += 1
+        else:
+            self._men[color] += 1
+        vector = self._tables[color][kind][loc[0]][loc[1]]
+        self._hash ^= self._keys[color][kind][loc[0]][loc[1]]
+        sums = self._features[color]
+        for i, value in enumerate(vector):
+            sums[i] += value
+
+    def _take_piece(self, loc):
+        """
+        Removes the piece at a location from the board and from its color's
+        piece counts, feature sums and the position's hash.
+
+        Parameters:
+            loc (tuple[int, int]): the location of the piece to remove
+
+        Returns:
+            (Piece): the removed piece
+        """
+        piece = self._board.get_piece(loc)
+        self._board.remove_piece(loc)
+        color = piece.get_color()
+        kind = "king" if piece.get_is_king() else "man"
+        if kind == "king":
+            self._kings[color] -= 1
+        else:
+            self._men[color] -= 1
+        vector = self._tables[color][kind][loc[0]][loc[1]]
+        self._hash ^= self._keys[color][kind][loc[0]][loc[1]]
+        sums = self._features[color]
+        for i, value in enumerate(vector):
+            sums[i] -= value
+        return piece
 
     def get_piece_moves(self, loc):
         """
@@ -148,25 +298,58 @@ class CheckerBoard:
     def game_over(self):
         """
         Checks if the game is over. If it is, return the player who won.
+        A game is drawn when neither player can move, when a position comes
+        up for the third time with the same player to move, or when the
+        no-progress limit is reached.
     
         Parameters: none
 
         Returns: 
-            If there is a winner, return their color. Otherwise, returns None
+            If there is a winner, return their color, or "draw" for a draw.
+            Otherwise, returns None
+        """
+        return self._get_result()[0]
+
+    def get_end_reason(self):
+        """
+        Returns why the game is over.
+
+        Parameters: none
+
+        Returns:
+            (str): "resigned", "no-moves", "repetition" or "no-progress", or
+                None if the game is not over
+        """
+        return self._get_result()[1]
+
+    def _get_result(self):
+        """
+        Works out the result of the game for game_over and get_end_reason.
+
+        Parameters: none
+
+        Returns:
+            (tuple[str, str]): the winner (or "draw") and why the game ended,
+                or (None, None) if the game is not over
         """
         if self._conceded == "red":
-            return "black"
+            return "black", "resigned"
         if self._conceded == "black":
-            return "red"
+            return "red", "resigned"
         red_loses = self.get_player_moves("red") == set()
         black_loses = self.get_player_moves("black") == set()
         if red_loses and black_loses:
-            return "draw"
+            return "draw", "no-moves"
         if red_loses:
-            return "black"
+            return "black", "no-moves"
         if black_loses:
-            return "red"
-        return None
+            return "red", "no-moves"
+        if self._seen[self._hash] >= 3:
+            return "draw", "repetition"
+        if (self._no_progress_limit is not None
+                and self._quiet >= self._no_progress_limit):
+            return "draw", "no-progress"
+        return None, None
 
     def perform_move(self, move):
         """
@@ -180,15 +363,124 @@ class CheckerBoard:
         """
         first_dest = move.get_steps()[0]
         final_dest = move.get_steps()[-1]
-        piece = self._board.get_piece(first_dest)
-        if piece.get_color() == "red" and final_dest[0] == 0:
-            piece.crown_piece()
-        if piece.get_color() == "black" and final_dest[0] == (self._size -1):
+        piece = self._take_piece(first_dest)
+        quiet = self._quiet
+        if piece.get_is_king() and not move.get_captured():
+            self._quiet += 1
+        else:
+            self._quiet = 0
+        crowned = False
+        if not piece.get_is_king():
+            if piece.get_color() == "red" and final_dest[0] == 0:
+                crowned = True
+            if piece.get_color() == "black" and final_dest[0] == (self._size -1):
+                crowned = True
+        if crowned:
             piece.crown_piece()
-        self._board.add_piece(piece, final_dest)
-        self._board.remove_piece(first_dest)
+        captured = []
         for remove_loc in move.get_captured():
-            self._board.remove_piece(remove_loc)
+            captured.append((remove_loc, self._take_piece(remove_loc)))
+        self._place_piece(piece, final_dest)
+        self._hash ^= self._turn_key
+        self._seen[self._hash] = self._seen.get(self._hash, 0) + 1
+        self._history.append((move, captured, crowned, quiet))
+
+    def undo_move(self):
+        """
+        Undoes the most recently performed move, putting back any pieces it
+        captured and uncrowning the moving piece if the move crowned it.
+
+        Parameters: none
+
+        Returns:
+            (Move): the move that was undone
+        """
+        move, captured, crowned, quiet = self._history.pop()
+        if self._seen[self._hash] == 1:
+            del self._seen[self._hash]
+        else:
+            self._seen[self._hash] -= 1
+        self._hash ^= self._turn_key
+        self._quiet = quiet
+        piece = self._take_piece(move.get_steps()[-1])
+        if crowned:
+            piece.uncrown_piece()
+        self._place_piece(piece, move.get_steps()[0])
+        for loc, captured_piece in captured:
+            self._place_piece(captured_piece, loc)
+        return move
+
+    def get_history_length(self):
+        """
+        Returns how many performed moves can currently be undone.
+
+        Parameters: none
+
+        Returns:
+            (int): the number of moves on the undo history
+        """
+        return len(self._history)
+
+    def get_no_progress_limit(self):
+        """
+        Returns how many moves in a row without a capture or a man moving
+        draw the game.
+
+        Parameters: none
+
+        Returns:
+            (int): the no-progress limit, or None if there is none
+        """
+        return self._no_progress_limit
+
+    def get_move_history(self):
+        """
+        Returns the moves performed since the board was created, reset or
+        cloned, oldest first.
+
+        Parameters: none
+
+        Returns:
+            (list[Move]): the performed moves
+        """
+        return [entry[0] for entry in self._history]
+
+    def get_men_count(self, color):
+        """
+        Returns the number of men (uncrowned pieces) a player has.
+
+        Parameters:
+            color (str): the player's color
+
+        Returns:
+            (int): the number of men
+        """
+        return self._men[color]
+
+    def get_king_count(self, color):
+        """
+        Returns the number of kings a player has.
+
+        Parameters:
+            color (str): the player's color
+
+        Returns:
+            (int): the number of kings
+        """
+        return self._kings[color]
+
+    def get_features(self, color):
+        """
+        Returns a player's positional feature sums, in the order given by
+        evaluation.FEATURES.
+
+        Parameters:
+            color (str): the player's color
+
+        Returns:
+            (list[int]): the feature sums
+        """
+        return self._features[color]
 
     def get_movable_pieces(self, color):
         """
@@ -208,14 +500,61 @@ class CheckerBoard:
     
     def reset(self):
         """
-        Resets the board to its original board state.
+        Resets the board to its original board state, forgetting the move
+        history and any concession.
 
         Parameters: none
 
         Returns: None
         """
         self._board.clear_board()
-        self._populate_board()
+        self._men = {"red": 0, "black": 0}
+        self._kings = {"red": 0, "black": 0}
+        self._features = {"red": [0] * len(FEATURES),
+                          "black": [0] * len(FEATURES)}
+        self._history = []
+        self._conceded = None
+        self._hash = 0
+        self._populate_board(self._n)
+        self._seen = {self._hash: 1}
+        self._quiet = 0
+
+    def clone(self):
+        """
+        Returns an independent copy of the board with its own pieces. This
+        is much cheaper than copy.deepcopy. The copy starts with an empty
+        move history, so moves made before cloning cannot be undone on it
+        and positions from before cloning do not count towards repetition.
+
+        Parameters: none
+
+        Returns:
+            (CheckerBoard): the copy
+        """
+        board = CheckerBoard.__new__(CheckerBoard)
+        board._n = self._n
+        board._size = self._size
+        board._board = Board(self._size, self._size)
+        grid = board._board.get_grid()
+        for row, pieces in enumerate(self._board.get_grid()):
+            for col, piece in enumerate(pieces):
+                if piece is not None:
+                    grid[row][col] = Piece(piece.get_color(),
+                                           piece.get_is_king())
+        board._men = dict(self._men)
+        board._kings = dict(self._kings)
+        board._tables = self._tables
+        board._features = {color: list(sums)
+                           for color, sums in self._features.items()}
+        board._history = []
+        board._conceded = self._conceded
+        board._keys = self._keys
+        board._turn_key = self._turn_key
+        board._hash = self._hash
+        board._seen = {self._hash: 1}
+        board._quiet = self._quiet
+        board._no_progress_limit = self._no_progress_limit
+        return board
 
     def get_grid(self):
         """
@@ -378,7 +717,7 @@ class Board:
         """
         for r in range(self._num_rows):
             for c in range(self._num_cols):
-                self._remove_piece((r, c))
+                self.remove_piece((r, c))
     
     def __str__(self):
         """
@@ -483,6 +822,16 @@ class Piece:
         """
         self._is_king = True
 
+    def uncrown_piece(self):
+        """
+        Makes this piece a regular piece again (used when undoing a move).
+
+        Parameters: none
+        
+        Returns: None
+        """
+        self._is_king = False
+
     def get_color(self):
         """
         Returns the color of the piece.
@@ -617,6 +966,30 @@ class Move:
         """
         return self._captured
         
+    def __eq__(self, other):
+        """
+        Checks whether two moves follow the same path.
+
+        Parameters:
+            other (object): the object to compare to
+
+        Returns:
+            (bool): whether the moves are equal
+        """
+        return isinstance(other, Move) and self._steps == other._steps
+
+    def __hash__(self):
+        """
+        Hashes the move by its path, so that sets of moves iterate in the
+        same order in every run and every process.
+
+        Parameters: none
+
+        Returns:
+            (int): the hash
+        """
+        return hash(tuple(self._steps))
+
     def __str__(self):
         """
         Returns string representation of the move
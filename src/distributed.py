@@ -0,0 +1,359 @@
+"""
+Simulations spread over worker processes on any number of machines
+
+A coordinator listens on a TCP port and hands out batches of game indices to
+the workers that connect to it. Workers play their batch with play_game and
+send back the records. While playing, a worker sends a heartbeat every few
+seconds, and a batch held by a worker whose connection drops, or that has not
+been heard from for the coordinator's timeout, is handed to another worker.
+Messages are JSON objects, one per line:
+
+    worker -> coordinator: {"type": "hello"}
+    coordinator -> worker: {"type": "setup", ...the run's settings...}
+    coordinator -> worker: {"type": "batch", "games": [indices]}
+    worker -> coordinator: {"type": "heartbeat"}
+    worker -> coordinator: {"type": "results", "records": [records]}
+    worker -> coordinator: {"type": "error", "message": "what went wrong"}
+
+A worker whose games raise an error reports it, and the coordinator stops the
+run with that error. Connections that send anything else are dropped.
+
+Workers stop when the coordinator closes the connection.
+"""
+import collections
+import json
+import multiprocessing
+import selectors
+import socket
+import threading
+import time
+
+from bot import play_game
+from checkers import CheckerBoard
+
+def parse_address(text):
+    """
+    Parses a "host:port" address
+
+    Parameters:
+        (str) text: the address
+
+    Returns:
+        (tuple[str, int]): the host and port
+    """
+    host, _, port = text.rpartition(":")
+    if not host or not port.isdigit():
+        raise ValueError(f"expected an address like localhost:5000, got '{text}'")
+    return host, int(port)
+
+def _send(sock, message):
+    """
+    Sends one message
+
+    Parameters:
+        (socket.socket) sock: the connection
+        (dict) message: the message
+
+    Returns: None
+    """
+    sock.sendall((json.dumps(message) + "\n").encode())
+
+# (int): how many workers may lose the same batch before the run gives up
+MAX_LOSSES = 3
+
+def _read_message(line):
+    """
+    Decodes a message from a worker, checking that it has a known type and
+    the fields that type needs
+
+    Parameters:
+        (bytes) line: the message's line
+
+    Returns:
+        (dict): the message, or None if it isn't a valid message
+    """
+    try:
+        message = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(message, dict):
+        return None
+    kind = message.get("type")
+    if kind in ("hello", "heartbeat"):
+        return message
+    if kind == "error" and isinstance(message.get("message"), str):
+        return message
+    if kind == "results" and isinstance(message.get("records"), list) \
+            and all(isinstance(record, dict)
+                    and isinstance(record.get("game"), int)
+                    for record in message["records"]):
+        return message
+    return None
+
+class _Connection:
+    """
+    A worker connected to the coordinator
+    """
+    __slots__ = ("sock", "buffer", "batch", "heard")
+
+    def __init__(self, sock):
+        # (socket.socket): the connection
+        self.sock = sock
+        # (bytearray): received bytes that don't make up a full line yet
+        self.buffer = bytearray()
+        # (list[int]): the games the worker is playing, or None if idle
+        self.batch = None
+        # (float): when the worker was last heard from or given a batch
+        # (time.monotonic)
+        self.heard = time.monotonic()
+
+def iter_distributed_games(board, n, b1, b2, turn_limit = -1, seed = None,
+                           first = 0, openings = None, keep_moves = False,
+                           address = ("127.0.0.1", 0), batch_size = 10,
+                           local_workers = 0, timeout = 60):
+    """
+    Plays games on the workers that connect to this coordinator, yielding
+    each record in game order (see iter_games in bot.py). With a seed, the
+    records are the same as when the games are played locally.
+
+    Parameters:
+        (tuple[str, int]) address: the host and port to listen on (port 0
+            picks a free port)
+        (int) batch_size: how many games to hand a worker at a time
+        (int) local_workers: how many workers to start on this machine
+        (float) timeout: how many seconds a worker playing a batch may go
+            unheard from (workers send a heartbeat four times as often)
+            before its batch is given to another worker; sends to a worker
+            also give up after this long
+        (other): see iter_games in bot.py
+
+    Returns:
+        (generator[dict]): the records, in game order
+    """
+    setup = {"type": "setup", "rows": (board.get_size() - 2) // 2,
+             "no_progress": board.get_no_progress_limit(), "b1": b1,
+             "b2": b2, "turn_limit": turn_limit, "seed": seed,
+             "openings": openings, "keep_moves": keep_moves,
+             "heartbeat": timeout / 4}
+    indices = list(range(first, n))
+    pending = collections.deque(indices[i:i + batch_size]
+                                for i in range(0, len(indices), batch_size))
+
+    server = socket.create_server(address)
+    server.setblocking(False)
+    host, port = server.getsockname()[:2]
+    print(f"Coordinator listening on {host}:{port}")
+
+    selector = selectors.DefaultSelector()
+    selector.register(server, selectors.EVENT_READ)
+    connections = []
+    processes = []
+    if host in ("0.0.0.0", "::"):
+        host = "127.0.0.1"
+    for _ in range(local_workers):
+        process = multiprocessing.Process(target = run_worker,
+                                          args = ((host, port),), daemon = True)
+        process.start()
+        processes.append(process)
+
+    def assign(connection):
+        # Hands the next batch to an idle worker
+        if connection.batch is None and pending:
+            connection.batch = pending.popleft()
+            connection.heard = time.monotonic()
+            _send(connection.sock, {"type": "batch",
+                                    "games": connection.batch})
+
+    def drop(connection):
+        # Forgets a worker, putting its batch back at the front of the queue
+        # unless too many workers have lost it already
+        selector.unregister(connection.sock)
+        connection.sock.close()
+        connections.remove(connection)
+        if connection.batch is not None:
+            batch = connection.batch
+            losses[batch[0]] += 1
+            if losses[batch[0]] >= MAX_LOSSES:
+                raise RuntimeError(f"{MAX_LOSSES} workers were lost while "
+                                   f"playing games {batch[0]}-{batch[-1]}, "
+                                   "giving up")
+            pending.appendleft(batch)
+            print(f"Lost a worker, reassigning games {connection.batch[0]}"
+                  f"-{connection.batch[-1]}")
+            for other in connections:
+                try:
+                    assign(other)
+                except OSError:
+                    # Found when its connection is next read
+                    pass
+
+    # (collections.Counter): how many times each batch, by its first game,
+    # has been lost
+    losses = collections.Counter()
+    finished = {}
+    next_game = first
+    try:
+        while next_game < n:
+            for key, _ in selector.select(timeout = 1):
+                if key.fileobj is server:
+                    sock, _ = server.accept()
+                    sock.settimeout(timeout)
+                    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+                    connection = _Connection(sock)
+                    connections.append(connection)
+                    selector.register(sock, selectors.EVENT_READ, connection)
+                    continue
+
+                connection = key.data
+                try:
+                    data = connection.sock.recv(1 << 16)
+                except OSError:
+                    data = b""
+                if not data:
+                    drop(connection)
+                    continue
+                connection.heard = time.monotonic()
+                connection.buffer.extend(data)
+                while b"\n" in connection.buffer:
+                    line, _, rest = connection.buffer.partition(b"\n")
+                    connection.buffer = bytearray(rest)
+                    message = _read_message(line)
+                    if message is None:
+                        print("A worker sent a message that could not be "
+                              "read, dropping it")
+                        drop(connection)
+                        break
+                    if message["type"] == "error":
+                        games = ("" if connection.batch is None else
+                                 f" playing games {connection.batch[0]}"
+                                 f"-{connection.batch[-1]}")
+                        raise RuntimeError(f"A worker failed{games}: "
+                                           f"{message['message']}")
+                    if message["type"] == "results":
+                        for record in message["records"]:
+                            if record["game"] >= next_game:
+                                finished[record["game"]] = record
+                        connection.batch = None
+                    try:
+                        if message["type"] == "hello":
+                            _send(connection.sock, setup)
+                        assign(connection)
+                    except OSError:
+                        drop(connection)
+                        break
+
+            # A worker that has gone quiet (its machine or network may be
+            # down without the connection failing) loses its batch
+            now = time.monotonic()
+            for connection in list(connections):
+                if connection.batch is not None \
+                        and now - connection.heard > timeout:
+                    print("A worker stopped responding")
+                    drop(connection)
+
+            while next_game in finished:
+                yield finished.pop(next_game)
+                next_game += 1
+    finally:
+        for connection in connections:
+            connection.sock.close()
+        selector.close()
+        server.close()
+        for process in processes:
+            process.join(timeout = 5)
+            if process.is_alive():
+                process.terminate()
+
+def _read_lines(lines):
+    """
+    Reads lines from a connection until it is closed or broken
+
+    Parameters:
+        (file) lines: the connection's file object
+
+    Returns:
+        (generator[bytes]): the lines
+    """
+    try:
+        yield from lines
+    except ConnectionError:
+        return
+
+def _send_heartbeats(sock, interval, stop):
+    """
+    Sends a heartbeat every interval seconds until stop is set or the
+    connection breaks
+
+    Parameters:
+        (socket.socket) sock: the connection to the coordinator
+        (float) interval: how many seconds to wait between heartbeats
+        (threading.Event) stop: set when the batch is finished
+
+    Returns: None
+    """
+    while not stop.wait(interval):
+        try:
+            _send(sock, {"type": "heartbeat"})
+        except OSError:
+            return
+
+def run_worker(address, retry = 30):
+    """
+    Connects to a coordinator and plays the games it hands out until it
+    closes the connection
+
+    Parameters:
+        (tuple[str, int]) address: the coordinator's host and port
+        (float) retry: how many seconds to keep trying to connect
+
+    Returns:
+        (int): how many games the worker played
+    """
+    deadline = time.monotonic() + retry
+    while True:
+        try:
+            sock = socket.create_connection(address)
+            break
+        except OSError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.5)
+
+    played = 0
+    with sock, sock.makefile("rb") as lines:
+        _send(sock, {"type": "hello"})
+        for line in _read_lines(lines):
+            message = json.loads(line)
+            if message["type"] == "setup":
+                settings = message
+                board = CheckerBoard(settings["rows"], settings["no_progress"])
+            elif message["type"] == "batch":
+                # Heartbeats stop before the results are sent, so the two
+                # never interleave
+                stop = threading.Event()
+                heartbeats = threading.Thread(
+                    target = _send_heartbeats,
+                    args = (sock, settings["heartbeat"], stop), daemon = True)
+                heartbeats.start()
+                try:
+                    records = [play_game(board, i, settings["b1"],
+                                         settings["b2"], settings["turn_limit"],
+                                         seed = settings["seed"],
+                                         openings = settings["openings"],
+                                         keep_moves = settings["keep_moves"])
+                               for i in message["games"]]
+                    reply = {"type": "results", "records": records}
+                    played += len(records)
+                except Exception as e:
+                    # Any other worker would fail the same way, so the
+                    # coordinator is told rather than handing the batch on
+                    reply = {"type": "error",
+                             "message": f"{type(e).__name__}: {e}"}
+                finally:
+                    stop.set()
+                    heartbeats.join()
+                try:
+                    _send(sock, reply)
+                except OSError:
+                    break
+    return played
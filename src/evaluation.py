@@ -0,0 +1,122 @@
+"""
+Table-driven positional evaluation for checkers
+"""
+import json
+import os
+
+# (tuple[str]): the evaluation terms, in the order they are stored in feature
+# vectors and weight vectors
+FEATURES = ("men", "kings", "advancement", "back_rank", "center",
+            "king_mobility")
+
+# (str): the weights file that is used when no other file is given
+DEFAULT_WEIGHTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                    "weights.json")
+
+# (dict[int, dict]): feature tables that have already been generated, by
+# board size
+_tables = {}
+
+# (dict[str, dict]): weight files that have already been read, by path
+_weight_files = {}
+
+def get_feature_tables(size):
+    """
+    Returns the piece-square tables for a board size, generating them the
+    first time they are asked for. Each table maps a square to the vector of
+    feature values a piece standing there contributes to its color.
+
+    Ex: get_feature_tables(8)["black"]["man"][1][2] -> (1, 0, 1, 0, 3, 0)
+
+    Parameters:
+        size (int): the side length of the board
+
+    Returns:
+        (dict[str, dict[str, list[list[tuple[int, ...]]]]]): the tables,
+            indexed by color, then "man" or "king", then row and column
+    """
+    if size not in _tables:
+        _tables[size] = {
+            color: {kind: [[_square_features(size, color, kind == "king",
+                                             (row, col))
+                            for col in range(size)]
+                           for row in range(size)]
+                    for kind in ("man", "king")}
+            for color in ("red", "black")
+        }
+    return _tables[size]
+
+def _square_features(size, color, is_king, loc):
+    """
+    Computes the feature vector of a single piece on a single square.
+
+    Parameters:
+        size (int): the side length of the board
+        color (str): the piece's color
+        is_king (bool): whether the piece is a king
+        loc (tuple[int, int]): the square the piece stands on
+
+    Returns:
+        (tuple[int, ...]): the piece's value for each of FEATURES
+    """
+    row, col = loc
+    # How many rows the piece is from its own back rank
+    advanced = row if color == "black" else size - 1 - row
+    # How many squares the piece is from the nearest edge
+    center = min(row, size - 1 - row) + min(col, size - 1 - col)
+    # How many squares the two diagonals through the piece cover, not
+    # counting the piece's own square
+    diagonals = (min(row, col) + min(size - 1 - row, size - 1 - col)
+                 + min(row, size - 1 - col) + min(size - 1 - row, col))
+
+    if is_king:
+        return (0, 1, 0, 0, center, diagonals)
+    return (1, 0, advanced, int(advanced == 0), center, 0)
+
+def load_weights(size, path=None):
+    """
+    Loads the evaluation weights for a board size from a JSON file. The file
+    holds a "default" object mapping feature names to weights, and optionally
+    a "sizes" object whose entries (keyed by side length) override some of
+    those weights for one board size. Features without a weight count as 0.
+
+    Parameters:
+        size (int): the side length of the board
+        path (str): the weights file (defaults to weights.json next to this
+            module)
+
+    Returns:
+        (tuple[float, ...]): the weight of each of FEATURES
+    """
+    if path is None:
+        path = DEFAULT_WEIGHTS_PATH
+    if path not in _weight_files:
+        with open(path) as f:
+            _weight_files[path] = json.load(f)
+    data = _weight_files[path]
+
+    weights = dict(data.get("default", {}))
+    weights.update(data.get("sizes", {}).get(str(size), {}))
+    for name in weights:
+        if name not in FEATURES:
+            raise ValueError(f"unknown evaluation feature '{name}' in {path}")
+
+    return tuple(float(weights.get(name, 0)) for name in FEATURES)
+
+def evaluate(board, color, weights):
+    """
+    Evaluates a board from one player's point of view using the feature sums
+    the board keeps up to date, so it costs the same on any board size.
+
+    Parameters:
+        board (CheckerBoard): the board to evaluate
+        color (str): the player the evaluation is for
+        weights (tuple[float, ...]): the weight of each of FEATURES
+
+    Returns:
+        (float): the evaluation, positive meaning the player is favored
+    """
+    opp_color = "black" if color == "red" else "red"
+    own = board.get_features(color)
+    opp = board.get_features(opp_color)
+    return sum(w * (a - b) for w, a, b in zip(weights, own, opp))
@@ -1,13 +1,21 @@
+import math
 import os
 import sys
 import copy
 from typing import Union, Dict
+import click
 from checkers import CheckerBoard
 from checkers import Piece
 from checkers import Move
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
 import pygame
 from bot import Bot
+from mcts import MCTSBot
+from archive import ArchiveWriter
+
+# (str): the game archive every game played is appended to, if any (set by
+# --archive)
+_archive = None
 
 
 
@@ -27,7 +35,7 @@ class GUIPlayer:
 
         Args:
             n: The player's number (1 or 2)
-            player_type: "human", "random-bot", or "smart-bot"
+            player_type: "human", "bot", or "mcts-bot"
             board: The Connect-M board
             color: The player's color
         Returns: none
@@ -38,6 +46,10 @@ class GUIPlayer:
         elif player_type == "bot":
             self.name = "bot"
             self.bot = Bot(board, color)
+        elif player_type == "mcts-bot":
+            self.name = "bot"
+            self.bot = MCTSBot(board, color, playouts=None, time_ms=1000)
+        self.player_type = player_type
         self.color = color
         self.board = board
         self.id = n
@@ -141,27 +153,52 @@ def start_screen(n = 4):
                     player1 = GUIPlayer(1, "human", board, "red") 
                     player2 = GUIPlayer(2, "bot", board, "black") 
                     players = {"red": player1, "black": player2}
-                    play_checkers(board, players)
+                    play_checkers(board, players, archive = _archive)
                 if x > 210 and y > 250 and x < 310 and y < 350:
                     menu(surface, n)
 
             pygame.display.flip()
 
 
-def draw_board(surface: pygame.surface.Surface, board, dimensions, turn = None, analyze = False) -> None:
+# The pre-rendered background of each board size and color scheme, keyed by
+# (dimensions, analyze) (see _get_background)
+_backgrounds = {}
+
+# What draw_board last put on the screen: the (dimensions, analyze) it was
+# drawn with and what is in each square (see _square_contents), or None if
+# the screen has been drawn over since
+_shown = None
+
+# The squares highlight_moves has tinted since the board was last drawn
+_tinted = set()
+
+# Whether pieces are drawn with smoothed (anti-aliased) edges
+ANTIALIAS = True
+
+# Pre-rendered pieces, keyed by (square size, color, king, outlined,
+# antialias) (see _get_piece_sprite)
+_piece_sprites = {}
+
+# Pre-rendered highlight overlays, keyed by (square size, color, tint) (see
+# _get_highlight)
+_highlights = {}
+
+def _get_background(dimensions, analyze):
     """
-    Draws the current state of the board on the given surface
+    Returns the board without pieces (the checkerboard pattern and the panel
+    below it) for a board size and color scheme, drawing it the first time
 
     Parameters:
-        surface: Pygame surface to draw the board on
-        board: An instance of the Board class representing the current state of the board
         dimensions: An integer that represents the dimensions of the board
-        turn: A string that represents whose turn it is on the board. Default -> None
-        analyze: A boolean that determines whether the board is drawn in analysis mode or not. Default -> False
-
-    Returns: none
+        analyze: A boolean that determines whether the board is drawn in analysis mode or not
 
+    Returns:
+        (pygame.Surface): the background, the size of the window
     """
+    key = (dimensions, analyze)
+    if key in _backgrounds:
+        return _backgrounds[key]
+
     # The color scheme is determined based off whether the board is in analysis mode or not
     if analyze:
         color_red = (44,49,66)
@@ -169,52 +206,15 @@ def draw_board(surface: pygame.surface.Surface, board, dimensions, turn = None,
     else:
         color_red = (86,28,1)
         color_beige = (225,190,130)
-    cond = False
-    grid = board.get_grid()
-    nrows = len(grid)
-    sq_size = 400 / nrows
+    sq_size = 400 / dimensions
+    surface = pygame.Surface((400, 500)).convert()
     surface.fill((84,91,114))
-    moves_tuples = []
 
     # Draws the checkerboard pattern through the dimension attribute
     for x in range(dimensions):
         for y in range (dimensions):
             color = color_red if (x+y) % 2 == 0 else color_beige
             pygame.draw.rect(surface, color, (y*sq_size, x*sq_size, sq_size, sq_size))
-    if turn is not None:
-        moves = board.get_player_moves(turn)
-        for x in moves:
-            moves_tuples.append(x.get_step(0))
-
-    # Draws the pieces as circles. A white outline distinguishes movable pieces while king pieces also have a gold outline
-    color = (255,255,0)
-    for x in range(dimensions):
-        for y in range (dimensions):
-            piece = board.get_piece((int(x), int(y)))
-            if color is not None:
-                for l in moves_tuples:
-                    if l[0] == int(x) and l[1] == int(y):
-                        cond = True
-            if piece is not None and cond:
-                if piece is not None and not piece.get_is_king():
-                    color = (70, 4, 4) if piece.get_color() == "red" else (0, 0, 0)
-                    pygame.draw.circle(surface, color, (y*sq_size + sq_size/2, x*sq_size + sq_size/2), sq_size/2 - 3)
-                    pygame.draw.circle(surface, (255, 255, 255), (y*sq_size + sq_size/2, x*sq_size + sq_size/2), sq_size/2 - 3, width=2)
-                elif  piece is not None and piece.get_is_king():
-                    color = (70, 4, 4) if piece.get_color() == "red" else (0, 0, 0)
-                    pygame.draw.circle(surface, color, (y*sq_size + sq_size/2, x*sq_size + sq_size/2), sq_size/2 - 3)
-                    color = (255,215,0)
-                    pygame.draw.circle(surface, color, (y*sq_size + sq_size/2, x*sq_size + sq_size/2), sq_size/2 - 3, width=8)
-                    pygame.draw.circle(surface, (255, 255, 255), (y*sq_size + sq_size/2, x*sq_size + sq_size/2), sq_size/2 - 3, width=2)
-            elif piece is not None and not piece.get_is_king():
-                color = (70, 4, 4) if piece.get_color() == "red" else (0, 0, 0)
-                pygame.draw.circle(surface, color, (y*sq_size + sq_size/2, x*sq_size + sq_size/2), sq_size/2 - 3)
-            elif  piece is not None and piece.get_is_king():
-                color = (70, 4, 4) if piece.get_color() == "red" else (0, 0, 0)
-                pygame.draw.circle(surface, color, (y*sq_size + sq_size/2, x*sq_size + sq_size/2), sq_size/2 - 3)
-                color = (255,215,0)
-                pygame.draw.circle(surface, color, (y*sq_size + sq_size/2, x*sq_size + sq_size/2), sq_size/2 - 3, width=8)
-            cond = False
 
     # Draws the components in the additional space below the checkerboards. Draws seperate instructions based off current state of board
     pygame.draw.rect(surface, (139, 101,76), (0, 400, 400, 100))
@@ -284,10 +284,197 @@ def draw_board(surface: pygame.surface.Surface, board, dimensions, turn = None,
         resign_rect.center = (100, 462)
         surface.blit(resign, resign_rect)
 
-    pygame.display.flip()
+    _backgrounds[key] = surface
+    return surface
+
+def _forget_board():
+    """
+    Notes that the screen no longer shows the board, so the next draw_board
+    redraws all of it
+
+    Parameters: none
+
+    Returns: none
+    """
+    global _shown
+    _shown = None
+    _tinted.clear()
+
+def _square_rect(x, y, sq_size):
+    """
+    Returns the smallest whole-pixel rectangle covering a square of the board
+
+    Parameters:
+        x: the square's row
+        y: the square's column
+        sq_size: the side length of a square in pixels
+
+    Returns:
+        (pygame.Rect): the rectangle
+    """
+    left = int(y * sq_size)
+    top = int(x * sq_size)
+    return pygame.Rect(left, top, math.ceil((y + 1) * sq_size) - left,
+                       math.ceil((x + 1) * sq_size) - top)
+
+def _square_contents(board, dimensions, turn):
+    """
+    Works out what draw_board shows in each square
+
+    Parameters:
+        board: the board to draw
+        dimensions: An integer that represents the dimensions of the board
+        turn: the color whose movable pieces are outlined, or None
+
+    Returns:
+        (list[list[tuple(str, bool, bool)]]): for each square, None if it is
+            empty, otherwise the piece's color, whether it is a king and
+            whether it is outlined as movable
+    """
+    movable = set()
+    if turn is not None:
+        for move in board.get_player_moves(turn):
+            movable.add(move.get_step(0))
+    contents = []
+    for x in range(dimensions):
+        row = []
+        for y in range(dimensions):
+            piece = board.get_piece((x, y))
+            if piece is None:
+                row.append(None)
+            else:
+                row.append((piece.get_color(), piece.get_is_king(),
+                            (x, y) in movable))
+        contents.append(row)
+    return contents
 
+def _get_piece_sprite(sq_size, piece_color, king, outlined, antialias):
+    """
+    Returns a piece drawn as circles on a transparent square, drawing it the
+    first time. A white outline distinguishes movable pieces while king
+    pieces also have a gold outline
 
-def menu_helper(surface, color = (217, 178, 130), n = 1):
+    Parameters:
+        sq_size: the side length of a square in pixels
+        piece_color: the piece's color, "red" or "black"
+        king: whether the piece is a king
+        outlined: whether the piece is outlined as movable
+        antialias: whether to smooth the circles' edges
+
+    Returns:
+        (pygame.Surface): the sprite, centered on the piece
+    """
+    key = (sq_size, piece_color, king, outlined, antialias)
+    if key in _piece_sprites:
+        return _piece_sprites[key]
+
+    # Smoothed pieces are drawn at a larger scale and then shrunk, which
+    # blends their edges into the transparent background
+    scale = 4 if antialias else 1
+    side = math.ceil(sq_size)
+    sprite = pygame.Surface((side * scale, side * scale), pygame.SRCALPHA)
+    center = (side * scale / 2, side * scale / 2)
+    radius = (sq_size/2 - 3) * scale
+    color = (70, 4, 4) if piece_color == "red" else (0, 0, 0)
+    pygame.draw.circle(sprite, color, center, radius)
+    if king:
+        pygame.draw.circle(sprite, (255,215,0), center, radius, width=8 * scale)
+    if outlined:
+        pygame.draw.circle(sprite, (255, 255, 255), center, radius, width=2 * scale)
+    if antialias:
+        sprite = pygame.transform.smoothscale(sprite, (side, side))
+
+    _piece_sprites[key] = sprite
+    return sprite
+
+def _draw_piece(surface, contents, x, y, sq_size):
+    """
+    Draws a piece by blitting its sprite (see _get_piece_sprite)
+
+    Parameters:
+        surface: Pygame surface to draw the piece on
+        contents: the piece's color, whether it is a king and whether it is outlined (see _square_contents)
+        x: the square's row
+        y: the square's column
+        sq_size: the side length of a square in pixels
+
+    Returns: none
+    """
+    sprite = _get_piece_sprite(sq_size, *contents, ANTIALIAS)
+    offset = sprite.get_width() / 2
+    surface.blit(sprite, (round(y*sq_size + sq_size/2 - offset),
+                          round(x*sq_size + sq_size/2 - offset)))
+
+def _get_highlight(sq_size, highlight_color, tint):
+    """
+    Returns a square tinted with a highlight color, drawing it the first time
+
+    Parameters:
+        sq_size: the side length of a square in pixels
+        highlight_color (tuple): RGB values of the highlight color
+        tint (int): Transparency level
+
+    Returns:
+        (pygame.Surface): the overlay
+    """
+    key = (sq_size, tuple(highlight_color), tint)
+    if key not in _highlights:
+        rect_surface = pygame.Surface((sq_size, sq_size), pygame.SRCALPHA)
+        rect_surface.fill((highlight_color[0], highlight_color[1], highlight_color[2], tint))
+        _highlights[key] = rect_surface
+    return _highlights[key]
+
+def draw_board(surface: pygame.surface.Surface, board, dimensions, turn = None, analyze = False) -> None:
+    """
+    Draws the current state of the board on the given surface. The first time
+    the board is shown, the whole window is drawn; after that only the
+    squares whose contents changed (or that were highlighted) are redrawn
+    from a pre-rendered background and updated on the screen
+
+    Parameters:
+        surface: Pygame surface to draw the board on
+        board: An instance of the Board class representing the current state of the board
+        dimensions: An integer that represents the dimensions of the board
+        turn: A string that represents whose turn it is on the board. Default -> None
+        analyze: A boolean that determines whether the board is drawn in analysis mode or not. Default -> False
+
+    Returns: none
+
+    """
+    global _shown
+    sq_size = 400 / dimensions
+    background = _get_background(dimensions, analyze)
+    contents = _square_contents(board, dimensions, turn)
+
+    full = _shown is None or _shown[0] != (dimensions, analyze)
+    if full:
+        surface.blit(background, (0, 0))
+    dirty = []
+    for x in range(dimensions):
+        for y in range(dimensions):
+            if full:
+                changed = contents[x][y] is not None
+            else:
+                changed = (contents[x][y] != _shown[1][x][y]
+                           or (x, y) in _tinted)
+            if not changed:
+                continue
+            rect = _square_rect(x, y, sq_size)
+            if not full:
+                surface.blit(background, rect, rect)
+            if contents[x][y] is not None:
+                _draw_piece(surface, contents[x][y], x, y, sq_size)
+            dirty.append(rect)
+
+    _shown = ((dimensions, analyze), contents)
+    _tinted.clear()
+    if full:
+        pygame.display.flip()
+    else:
+        pygame.display.update(dirty)
+
+
+def menu_helper(surface, color = (217, 178, 130), n = 1, bot_type = "bot"):
     """
     Draws a checkers menu on a given surface
 
@@ -295,6 +482,7 @@ def menu_helper(surface, color = (217, 178, 130), n = 1):
         surface (pygame.Surface): the surface to draw the menu on
         color (tuple): the color of the rectangle labled "BOARD SIZE". Defaults to (217, 178, 130)
         n (int): optional parameter to set the size of the board. Defaults to 0
+        bot_type (str): the GUIPlayer type used for bots ("bot" or "mcts-bot"). Defaults to "bot"
     Returns:
         none
     """
@@ -376,19 +564,27 @@ def menu_helper(surface, color = (217, 178, 130), n = 1):
     text_rect2.center = (143, 290)
     surface.blit(second_text_surface, text_rect2)
 
+    # This displays which engine the bots will use
+    engine = "MCTS" if bot_type == "mcts-bot" else "MINIMAX"
+    engine_surface = font1.render(f"BOT ENGINE: {engine} (press M to switch)", True, (255, 255, 255))
+    engine_rect = engine_surface.get_rect()
+    engine_rect.center = (200, 380)
+    surface.blit(engine_surface, engine_rect)
+
 
-def menu(surface, n = 1):
+def menu(surface, n = 1, bot_type = "bot"):
     """
     Displays the Checkers menu given a pygame. Provides options for the user.
 
     Parameters:
     surface (Pygame surface object): The surface to display the menu on
     n (int): Size of board. Defaults to 1
+    bot_type (str): The GUIPlayer type used for bots ("bot" or "mcts-bot"). Defaults to "bot"
 
     Returns:
     None
     """
-    menu_helper(surface, n)
+    menu_helper(surface, n = n, bot_type = bot_type)
     font3 = pygame.font.SysFont("Arial", 15)
     cond = True
     active = False
@@ -412,21 +608,21 @@ def menu(surface, n = 1):
                     player1 = GUIPlayer(1, "human", board, "red") 
                     player2 = GUIPlayer(2, "human", board, "black") 
                     players = {"red": player1, "black": player2}
-                    play_checkers(board, players)
+                    play_checkers(board, players, archive = _archive)
                 elif x > 210 and x < 310 and y > 120 and y < 220:
                     cond = False
                     pygame.quit()
                     board = CheckerBoard(n)
                     player1 = GUIPlayer(1, "human", board, "red") 
-                    player2 = GUIPlayer(2, "bot", board, "black") 
+                    player2 = GUIPlayer(2, bot_type, board, "black") 
                     players = {"red": player1, "black": player2}
-                    play_checkers(board, players)
+                    play_checkers(board, players, archive = _archive)
                 elif x > 210 and y > 250 and x < 310 and y < 350:
                     board = CheckerBoard(n)
-                    player1 = GUIPlayer(1, "bot", board, "red") 
-                    player2 = GUIPlayer(2, "bot", board, "black") 
+                    player1 = GUIPlayer(1, bot_type, board, "red") 
+                    player2 = GUIPlayer(2, bot_type, board, "black") 
                     players = {"red": player1, "black": player2}
-                    play_checkers(board, players)
+                    play_checkers(board, players, archive = _archive)
                 elif x > 50 and y > 440 and x < 150 and y < 490:
                     start_screen(1)
             if event.type == pygame.KEYDOWN:
@@ -440,7 +636,9 @@ def menu(surface, n = 1):
                     elif event.unicode.isdigit():
                         text = event.unicode
                         n += int(text)
-            menu_helper(surface, (124,252,0) if active else (217, 178, 130), n)
+                elif event.key == pygame.K_m:
+                    bot_type = "mcts-bot" if bot_type == "bot" else "bot"
+            menu_helper(surface, (124,252,0) if active else (217, 178, 130), n, bot_type)
             pygame.display.flip()
 
 
@@ -462,12 +660,12 @@ def highlight_moves (board, surface, moves, highlight_color = (255, 255, 0), tin
 
     size = board.get_size()
     sq_size = 400 / size
+    rect_surface = _get_highlight(sq_size, highlight_color, tint)
     for move in moves:
         x = move[0]
         y = move[1]
-        rect_surface = pygame.Surface((sq_size, sq_size), pygame.SRCALPHA)
-        rect_surface.fill((highlight_color[0], highlight_color[1], highlight_color[2], tint))
         surface.blit(rect_surface, (y * sq_size, x * sq_size))
+        _tinted.add((x, y))
 
 
 def end_screen(surface: pygame.surface, previous, current, two_player):
@@ -491,6 +689,7 @@ def end_screen(surface: pygame.surface, previous, current, two_player):
     sound.set_volume(0.4)
 
     surface = pygame.display.set_mode((400, 500))
+    _forget_board()
     surface.fill((191, 153, 105))
     pygame.draw.rect(surface, (139, 101,76), (80, 250, 240, 100))
     font = pygame.font.SysFont("Arial", 30, bold=True)
@@ -540,7 +739,7 @@ def end_screen(surface: pygame.surface, previous, current, two_player):
     
 
 def play_checkers(board, players: Dict,
-                   bot_delay = 450) -> None:
+                   bot_delay = 450, archive = None) -> None:
     """
     Plays a game of checkers with the given board and players.
 
@@ -548,6 +747,7 @@ def play_checkers(board, players: Dict,
         board (Board): The checkers board on which the game is played.
         players (Dict): A dictionary of players, where the keys are their colors ("red" or "black"), and the values are Player objects. 
         bot_delay (int): The delay (in milliseconds) between bot moves. Defaults to 450.
+        archive (str): If given, the game is appended to this game archive (see archive.py) when it ends, or with the reason "quit" if the window is closed.
 
     Returns:
         None
@@ -564,6 +764,7 @@ def play_checkers(board, players: Dict,
     if red.bot is None and black.bot is None:
         two_player = True
     sq_size = 400/ board.get_size()
+    _forget_board()
     draw_board(surface, board, board.get_size(), "red")
     original = None
     sound_file = os.path.join('click.mp3')
@@ -571,6 +772,10 @@ def play_checkers(board, players: Dict,
     final_set = set()
     previous = [board]
     back_index = 0
+    # The squares each move visits, for the archive (a human's jumps are made
+    # one at a time, so a jump that continues is added to the last move)
+    played = []
+    continuing = False
     # Enters while loop to check if user is interacting with the surface
     while not board.game_over():
         events = pygame.event.get()
@@ -579,6 +784,8 @@ def play_checkers(board, players: Dict,
         # Retrieves any action that the user has taken
         for event in events:
             if event.type == pygame.QUIT:
+                if archive is not None:
+                    archive_game(archive, board, players, played, "draw", "quit")
                 pygame.quit()
                 sys.exit()
             elif event.type == pygame.KEYDOWN and event.key == pygame.K_LEFT:
@@ -622,11 +829,15 @@ def play_checkers(board, players: Dict,
                                 pygame.display.update()
                     elif (row, col) in final_set:
                         # The user has already selected a piece, and has now clicked again initating a piece move
-                        previous.append(copy.deepcopy(board))
+                        previous.append(board.clone())
                         sound.play()
                         temp = Move (original)
                         temp.add_step((int(row),int(col)))
                         board.perform_move(temp)
+                        if continuing:
+                            played[-1].extend(temp.get_steps()[1:])
+                        else:
+                            played.append(list(temp.get_steps()))
                         
                         captured = False
                         if len(temp.get_captured()) > 0:
@@ -637,7 +848,8 @@ def play_checkers(board, players: Dict,
                         for z in possible_moves:
                             possible_captures = board.can_capture((temp_move), z.get_steps()[-1])
 
-                        if not (possible_captures and captured): 
+                        continuing = possible_captures and captured
+                        if not continuing: 
                             if current.get_id() == red.get_id():
                                 current = black
                             elif current.get_id() == black.get_id():
@@ -654,12 +866,13 @@ def play_checkers(board, players: Dict,
 
         if current.bot is not None:
             # Bot makes its move, and a sound plays
-            previous.append(copy.deepcopy(board))
+            previous.append(board.clone())
             move = current.bot.suggest_move()
             pygame.time.wait(bot_delay)
             if red.bot is not None and black.bot is not None:
                 pygame.time.wait(100)
             board.perform_move(move)
+            played.append(list(move.get_steps()))
 
             sound.play()
             if current.get_color() == "black":
@@ -668,6 +881,10 @@ def play_checkers(board, players: Dict,
                 current = black
             draw_board(surface, board, board.get_size(), current.get_color())
 
+    if archive is not None:
+        archive_game(archive, board, players, played, board.game_over(),
+                     board.get_end_reason())
+
     end_screen(surface, previous, current, two_player)
 
     winner = board.game_over()
@@ -677,6 +894,25 @@ def play_checkers(board, players: Dict,
         print("It's a tie!")
 
 
+def archive_game(archive, board, players: Dict, moves, winner, reason) -> None:
+    """
+    Appends a game to a game archive.
+
+    Args:
+        archive (str): The archive's data file (see archive.py).
+        board (Board): The board the game was played on.
+        players (Dict): The players, where the keys are their colors.
+        moves (list): The squares each move of the game visited.
+        winner (str): "black", "red" or "draw".
+        reason (str): Why the game ended (see archive.REASONS).
+
+    Returns:
+        None
+    """
+    with ArchiveWriter(archive) as archiver:
+        archiver.write_game(board.get_size(), players["black"].player_type,
+                            players["red"].player_type, winner, reason, moves)
+
 def analyze(surface: pygame.surface.Surface, previous_moves, color, two_player):
     """
     Analyzes a game of checkers, based off a list of board states, allowing the user to go back and forth,
@@ -693,6 +929,7 @@ def analyze(surface: pygame.surface.Surface, previous_moves, color, two_player):
 
     position = 0
     current_board =  previous_moves[len(previous_moves)-1]
+    _forget_board()
     draw_board(surface, current_board, previous_moves[len(previous_moves) - 1 - position].get_size(), None, True)
     turn = copy.deepcopy(color)
     while True:
@@ -743,4 +980,16 @@ def analyze(surface: pygame.surface.Surface, previous_moves, color, two_player):
 
 
 
-start_screen(1)
\ No newline at end of file
+@click.command()
+@click.option('--archive', type=click.Path(dir_okay=False), default=None)
+def cmd(archive):
+    """
+    Opens the game's home screen
+    """
+    global _archive
+    _archive = archive
+    start_screen(1)
+
+
+if __name__ == "__main__":
+    cmd()
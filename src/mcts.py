@@ -0,0 +1,249 @@
+"""
+Monte Carlo Tree Search bot for checkers
+"""
+import random
+import math
+import time
+
+from evaluation import load_weights, evaluate
+
+class MCTSBot:
+    """
+    Anytime bot that picks moves with Monte Carlo Tree Search, using UCT to
+    select which lines to explore and short random playouts to score them
+    """
+
+    def __init__(self, board, color, playouts = 1000, time_ms = None,
+                 playout_depth = 20, exploration = math.sqrt(2),
+                 weights = None):
+        """
+        Constructor
+
+        Args:
+            (CheckerBoard) board: board for bot to play on (automatically updates with moves)
+            (str) color: bot's color
+            (int) playouts: how many playouts to run per move (None for no limit)
+            (int) time_ms: how many milliseconds to think per move (None for no limit)
+            (int) playout_depth: how many random moves a playout makes before
+                the position is judged by static evaluation
+            (float) exploration: the UCT exploration constant
+            (str) weights: file to load evaluation weights from (default is
+                weights.json, see evaluation.py)
+        """
+        if playouts is None and time_ms is None:
+            raise ValueError("MCTSBot needs a playout or time budget")
+
+        # (CheckerBoard): the board for the bot to play on
+        self._board = board
+
+        # (str): the bot's color, either "black" or "red"
+        self._color = color
+
+        # (str): the opponent's color, either "black" or "red"
+        self._opp_color = "black" if color == "red" else "red"
+
+        # (int): the maximum number of playouts per move
+        self._playouts = playouts
+
+        # (int): the maximum thinking time per move, in milliseconds
+        self._time_ms = time_ms
+
+        # (int): how many moves a playout makes before it is cut off
+        self._playout_depth = playout_depth
+
+        # (float): how strongly UCT favors rarely visited moves
+        self._exploration = exploration
+
+        # (tuple[float, ...]): the weights used to judge cut-off playouts
+        self._weights = load_weights(board.get_size(), weights)
+
+        # (MCTSNode): the root of the current (or last) search tree
+        self._root = None
+
+        # (int): how many playouts the current (or last) search has run
+        self._nodes = 0
+
+    def suggest_move(self, stop = None):
+        """
+        Grows a search tree from the current position until the playout or
+        time budget runs out, then picks the most visited move.
+
+        Parameters:
+            (threading.Event) stop: if given, setting it from another thread
+                ends the search after the current playout
+
+        Returns:
+            (Move): the bot's chosen move!
+        """
+        self._root = None
+        self._nodes = 0
+        possible = self._board.get_player_moves(self._color)
+        if len(possible) == 0:
+            return None
+        if len(possible) == 1:
+            return list(possible)[0]
+
+        root = MCTSNode(None, None, self._color, possible)
+        self._root = root
+        if self._time_ms is not None:
+            deadline = time.perf_counter() + self._time_ms / 1000
+
+        # The first playout always runs, so even a budget too small for any
+        # playout leaves a move to play
+        while self._nodes == 0 or self._playouts is None \
+                or self._nodes < self._playouts:
+            if self._nodes > 0 and self._time_ms is not None \
+                    and time.perf_counter() >= deadline:
+                break
+            if stop is not None and stop.is_set() and root.children:
+                break
+            self._run_playout(root)
+            self._nodes += 1
+
+        return self.get_best_move()
+
+    def _run_playout(self, root):
+        """
+        Runs one round of selection, expansion, playout and backpropagation,
+        leaving the board as it was found.
+
+        Parameters:
+            (MCTSNode) root: the root of the search tree
+
+        Returns: None
+        """
+        board = self._board
+        node = root
+        made = 0
+
+        # Selection: follow UCT down through fully expanded nodes
+        while not node.untried and node.children:
+            node = node.select_child(self._exploration)
+            board.perform_move(node.move)
+            made += 1
+
+        # Expansion: add one untried move as a new child
+        if node.untried:
+            move = node.untried.pop()
+            board.perform_move(move)
+            made += 1
+            player = "black" if node.player == "red" else "red"
+            node = node.add_child(move, player,
+                                  board.get_player_moves(player))
+
+        # Playout: make random moves from the new node
+        player = node.player
+        moves = node.untried
+        played = 0
+        loser = None
+        while True:
+            if len(moves) == 0:
+                loser = player
+                break
+            if played >= self._playout_depth:
+                break
+            board.perform_move(random.choice(list(moves)))
+            played += 1
+            player = "black" if player == "red" else "red"
+            moves = board.get_player_moves(player)
+
+        # Score the playout for the bot (1 for a win, 0 for a loss)
+        if loser is not None:
+            result = 0 if loser == self._color else 1
+        else:
+            value = evaluate(board, self._color, self._weights)
+            result = 1 if value > 0 else 0 if value < 0 else 0.5
+
+        for _ in range(played + made):
+            board.undo_move()
+
+        # Backpropagation: credit each node from the view of the player who
+        # made the move leading to it
+        while node is not None:
+            node.visits += 1
+            if node.player != self._color:
+                node.wins += result
+            else:
+                node.wins += 1 - result
+            node = node.parent
+
+    def get_nodes(self):
+        return self._nodes
+
+    def get_best_move(self):
+        """
+        Returns the move the current search would play if it stopped now
+        (its most visited move). Safe to call from another thread while
+        suggest_move runs.
+
+        Parameters: None
+
+        Returns:
+            (Move): the best move so far, or None if there is none yet
+        """
+        root = self._root
+        if root is None or not root.children:
+            return None
+        return max(list(root.children), key = lambda node: node.visits).move
+
+    def get_color(self):
+        return self._color
+
+class MCTSNode:
+    """
+    Node of a Monte Carlo search tree, storing the move that leads to it and
+    the playout statistics gathered below it
+    """
+    __slots__ = ("move", "parent", "player", "untried", "children",
+                 "visits", "wins")
+
+    def __init__(self, move, parent, player, moves):
+        """
+        Constructor
+
+        Parameters:
+            (Move) move: the move that leads to this node (None at the root)
+            (MCTSNode) parent: the node this one was expanded from
+            (str) player: whose turn it is at this node
+            (set[Move]) moves: the moves available at this node
+        """
+        self.move = move
+        self.parent = parent
+        self.player = player
+        self.untried = list(moves)
+        random.shuffle(self.untried)
+        self.children = []
+        self.visits = 0
+        # (float): playout results from the view of the player who made
+        # self.move (1 per win, 0.5 per draw)
+        self.wins = 0
+
+    def add_child(self, move, player, moves):
+        """
+        Adds a child node for a move that has just been expanded.
+
+        Parameters:
+            (Move) move: the expanded move
+            (str) player: whose turn it is after the move
+            (set[Move]) moves: the moves available after the move
+
+        Returns:
+            (MCTSNode): the new child
+        """
+        child = MCTSNode(move, self, player, moves)
+        self.children.append(child)
+        return child
+
+    def select_child(self, exploration):
+        """
+        Picks the child with the highest UCT score.
+
+        Parameters:
+            (float) exploration: the UCT exploration constant
+
+        Returns:
+            (MCTSNode): the selected child
+        """
+        log_visits = math.log(self.visits)
+        return max(self.children, key = lambda node: node.wins / node.visits
+                   + exploration * math.sqrt(log_visits / node.visits))
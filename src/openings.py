@@ -0,0 +1,101 @@
+"""
+Starting-position suites for bot matches
+"""
+from utils import loc_to_idx, idx_to_loc
+
+def load_openings(path):
+    """
+    Loads openings from a text file with one opening per line. An opening
+    is a sequence of moves separated by spaces, black moving first, and each
+    move lists the squares it visits separated by dashes. Blank lines and
+    lines starting with "#" are skipped.
+
+    Ex: "B6-A5 A3-B4 A7-B6" (on an 8x8 board)
+
+    Parameters:
+        (str) path: the file to load
+
+    Returns:
+        (list[str]): the openings
+    """
+    openings = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                openings.append(" ".join(line.split()))
+    return openings
+
+def apply_opening(board, opening):
+    """
+    Plays an opening's moves on a board, checking that each one is legal.
+
+    Parameters:
+        (CheckerBoard) board: the board to play on
+        (str) opening: the opening (see load_openings)
+
+    Returns:
+        (str): the color whose turn it is after the opening
+    """
+    player = "black"
+    for text in opening.split():
+        try:
+            steps = [loc_to_idx(loc, board.get_size()) for loc in text.split("-")]
+        except (ValueError, TypeError, AssertionError):
+            raise ValueError(f"'{text}' is not a valid move in '{opening}'")
+        for move in board.get_player_moves(player):
+            if move.get_steps() == steps:
+                board.perform_move(move)
+                break
+        else:
+            raise ValueError(f"'{text}' is not a legal {player} move in "
+                             f"'{opening}'")
+        player = "black" if player == "red" else "red"
+    return player
+
+def format_move(move, board_size):
+    """
+    Writes a move in the notation openings use.
+
+    Parameters:
+        (Move) move: the move
+        (int) board_size: the side length of the board
+
+    Returns:
+        (str): the move, e.g. "B6-A5"
+    """
+    return "-".join(idx_to_loc(step, board_size) for step in move.get_steps())
+
+def generate_openings(board, plies, balanced = True):
+    """
+    Lists every opening of a given number of moves from a position.
+
+    Parameters:
+        (CheckerBoard) board: the starting position (left unchanged)
+        (int) plies: how many moves each opening has
+        (bool) balanced: whether to keep only openings after which both
+            players have the same number of pieces
+
+    Returns:
+        (list[str]): the openings, sorted
+    """
+    openings = []
+    size = board.get_size()
+
+    def extend(player, moves, remaining):
+        if remaining == 0:
+            material = {color: board.get_men_count(color)
+                        + board.get_king_count(color)
+                        for color in ("red", "black")}
+            if not balanced or material["red"] == material["black"]:
+                openings.append(" ".join(moves))
+            return
+        next_player = "black" if player == "red" else "red"
+        for move in board.get_player_moves(player):
+            board.perform_move(move)
+            extend(next_player, moves + [format_move(move, size)],
+                   remaining - 1)
+            board.undo_move()
+
+    extend("black", [], plies)
+    return sorted(openings)
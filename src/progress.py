@@ -0,0 +1,166 @@
+"""
+Progress line and timing summary for long simulations
+"""
+import sys
+import time
+
+class ProgressLine:
+    """
+    Keeps a single status line up to date while games finish, redrawing it
+    at most a few times a second so that printing never slows down fast
+    bots, and sums up where the time went once the run is over
+    """
+
+    def __init__(self, total, live = True, interval = 0.5, stream = None):
+        """
+        Constructor
+
+        Parameters:
+            (int) total: the most games the run will play
+            (bool) live: whether to draw the line (otherwise games are only
+                counted for the summary)
+            (float) interval: the fewest seconds between redraws
+            (file) stream: where to write (default is standard output)
+        """
+        # (int): the most games the run will play
+        self._total = total
+
+        # (bool): whether the line is drawn
+        self._live = live
+
+        # (float): the fewest seconds between redraws
+        self._interval = interval
+
+        # (file): where the line is written
+        self._stream = stream if stream is not None else sys.stdout
+
+        # (float): when the run started
+        self._started = time.perf_counter()
+
+        # (float): when the line was last drawn
+        self._drawn = 0.0
+
+        # (int): how many games were finished before this run (restored
+        # from a checkpoint), which don't count towards the rates
+        self._restored = 0
+
+        # (int): games finished in this run, and their plies
+        self._games = 0
+        self._plies = 0
+
+        # (float): the summed time of the games finished in this run, and
+        # how much of it the bots spent choosing moves
+        self._game_time = 0.0
+        self._search_time = 0.0
+
+        # (int): length of the last line drawn, so a shorter one can blank
+        # it out
+        self._width = 0
+
+    def restored(self, count):
+        """
+        Counts games that were finished before this run
+
+        Parameters:
+            (int) count: how many games were restored
+
+        Returns: None
+        """
+        self._restored += count
+
+    def update(self, record, b1wins, b2wins):
+        """
+        Counts a finished game and redraws the line if it is due
+
+        Parameters:
+            (dict) record: the game's record (see play_game in bot.py)
+            (int) b1wins: how many games bot 1 has won so far
+            (int) b2wins: how many games bot 2 has won so far
+
+        Returns: None
+        """
+        self._games += 1
+        self._plies += record["plies"]
+        self._game_time += record["time"]
+        self._search_time += record.get("search_time", 0.0)
+
+        if not self._live:
+            return
+        now = time.perf_counter()
+        done = self._restored + self._games
+        if now - self._drawn < self._interval and done < self._total:
+            return
+        self._drawn = now
+
+        elapsed = max(now - self._started, 1e-9)
+        rate = self._games / elapsed
+        decided = b1wins + b2wins
+        win_rate = f"{100 * b1wins / decided:.1f}%" if decided else "-"
+        if rate > 0:
+            eta = _format_seconds((self._total - done) / rate)
+        else:
+            eta = "-"
+        line = (f"{done}/{self._total} games | {rate:.1f} games/s | "
+                f"{self._plies / elapsed:.0f} plies/s | bot 1 won {win_rate} "
+                f"| ETA {eta}")
+        self._stream.write("\r" + line.ljust(self._width))
+        self._stream.flush()
+        self._width = len(line)
+
+    def finish(self):
+        """
+        Ends the progress line and prints the timing summary
+
+        Parameters: None
+
+        Returns: None
+        """
+        if self._width:
+            self._stream.write("\n")
+        elapsed = time.perf_counter() - self._started
+        print(format_timing(self._games, self._plies, elapsed,
+                            self._game_time, self._search_time),
+              file = self._stream)
+        self._stream.flush()
+
+def format_timing(games, plies, elapsed, game_time, search_time):
+    """
+    Describes how fast a run went and how its game time divides between
+    the bots' searches and the bookkeeping around them (making moves,
+    checking for the end of the game, building records)
+
+    Parameters:
+        (int) games: how many games were played
+        (int) plies: how many moves they took
+        (float) elapsed: the run's wall-clock time, in seconds
+        (float) game_time: the summed time of the games, in seconds
+        (float) search_time: the part of game_time spent choosing moves
+
+    Returns:
+        (str): the summary
+    """
+    elapsed = max(elapsed, 1e-9)
+    lines = [f"Played {games} games ({plies} plies) in "
+             f"{_format_seconds(elapsed)}: {games / elapsed:.1f} games/s, "
+             f"{plies / elapsed:.0f} plies/s"]
+    if game_time > 0:
+        bookkeeping = max(game_time - search_time, 0.0)
+        lines.append(f"Game time {game_time:.2f}s: search "
+                     f"{search_time:.2f}s ({100 * search_time / game_time:.1f}%)"
+                     f", bookkeeping {bookkeeping:.2f}s "
+                     f"({100 * bookkeeping / game_time:.1f}%)")
+    return "\n".join(lines)
+
+def _format_seconds(seconds):
+    """
+    Formats a duration as h:mm:ss
+
+    Parameters:
+        (float) seconds: the duration
+
+    Returns:
+        (str): the formatted duration
+    """
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
@@ -0,0 +1,163 @@
+"""
+Streaming storage for simulated game records
+"""
+import csv
+import json
+import os
+
+# (list[str]): the fields of a game record, in the order CSV columns use
+RECORD_FIELDS = ["game", "bot1_color", "bot2_color", "winner", "reason",
+                 "on_material", "plies", "opening_plies", "material", "time",
+                 "search_time"]
+
+class RecordWriter:
+    """
+    Appends game records to a file as soon as each game finishes, as JSON
+    lines or, for files ending in ".csv", as CSV rows
+    """
+
+    def __init__(self, path, keep = None):
+        """
+        Constructor
+
+        Parameters:
+            (str) path: the file to write to
+            (int) keep: if given, the file's first keep bytes (see tell) are
+                kept and records are written after them, for continuing an
+                interrupted run; otherwise the file is started over
+        """
+        # (bool): whether records are written as CSV rather than JSON lines
+        self._is_csv = path.lower().endswith(".csv")
+
+        # (file): the open output file
+        if keep is None:
+            self._file = open(path, "w", newline = "")
+        else:
+            if not os.path.exists(path) or os.path.getsize(path) < keep:
+                raise ValueError(f"{path} is shorter than when it was "
+                                 "checkpointed")
+            self._file = open(path, "r+", newline = "")
+            self._file.seek(keep)
+            self._file.truncate()
+
+        # (csv.DictWriter): the CSV writer, if writing CSV
+        self._csv = None
+        if self._is_csv:
+            self._csv = csv.DictWriter(self._file, fieldnames = RECORD_FIELDS,
+                                       extrasaction = "ignore")
+            if not keep:
+                self._csv.writeheader()
+
+    def write(self, record):
+        """
+        Writes a record and flushes it, so finished games survive a crash
+
+        Parameters:
+            (dict) record: the game record
+
+        Returns: None
+        """
+        if self._is_csv:
+            self._csv.writerow(record)
+        else:
+            self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def tell(self):
+        """
+        Gives the size of the file so far
+
+        Parameters: None
+
+        Returns:
+            (int): how many bytes have been written, records and header
+        """
+        return self._file.tell()
+
+    def close(self):
+        """
+        Closes the output file
+
+        Parameters: None
+
+        Returns: None
+        """
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_records(path):
+    """
+    Reads the game records back from a file written by RecordWriter, one at
+    a time
+
+    Parameters:
+        (str) path: the file to read
+
+    Returns:
+        (generator[dict]): the records, in the order they were written
+    """
+    with open(path, newline = "") as f:
+        if not path.lower().endswith(".csv"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+
+        for row in csv.DictReader(f):
+            record = dict(row)
+            for field in ("game", "plies", "material"):
+                record[field] = int(record[field])
+            # Files written before openings were counted have no such column
+            record["opening_plies"] = int(record.get("opening_plies") or 0)
+            for field in ("time", "search_time"):
+                record[field] = float(record[field]) if record[field] else None
+            record["on_material"] = record["on_material"] == "True"
+            record["winner"] = record["winner"] or None
+            yield record
+
+def save_checkpoint(path, config, state):
+    """
+    Writes a simulation checkpoint. The file is written under a temporary
+    name and then moved into place, so an interrupted write never replaces
+    a good checkpoint with a broken one. Only running totals are saved, not
+    the finished games, so checkpoints stay small however long the run.
+
+    Parameters:
+        (str) path: the checkpoint file
+        (dict) config: the run's settings, checked again on resume
+        (dict) state: how many games are finished ("games"), bot 1's and bot
+            2's wins ("bot1_wins" and "bot2_wins"), the ties ("ties"), bot
+            1's total material advantage ("material"), the seed the games
+            are played with ("seed"), and the output file ("output") and how
+            many bytes of it hold the finished games ("output_size")
+
+    Returns: None
+    """
+    data = {"config": config, "state": state}
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(temp_path, path)
+
+def load_checkpoint(path):
+    """
+    Reads a simulation checkpoint written by save_checkpoint.
+
+    Parameters:
+        (str) path: the checkpoint file
+
+    Returns:
+        (tuple[dict, dict]): the run's settings and its state (see
+            save_checkpoint)
+    """
+    with open(path) as f:
+        data = json.load(f)
+    if "state" not in data:
+        raise ValueError(f"{path} is a checkpoint from an older version and "
+                         "cannot be resumed")
+    return data["config"], data["state"]
@@ -0,0 +1,117 @@
+"""
+Rating statistics for bot matches
+"""
+import math
+
+def fit_elo(names, results, iterations = 1000):
+    """
+    Estimates Elo ratings from game results with a Bradley-Terry model,
+    counting draws as half a win for each side. Every pair that played is
+    given one extra virtual draw so that a bot that never scored still gets
+    a finite rating. Ratings are centered on an average of 0.
+
+    Parameters:
+        (list[str]) names: the players
+        (dict[tuple[str, str], list[int]]) results: the wins, draws and
+            losses of the first player of each pair against the second
+        (int) iterations: how many rounds of the fitting algorithm to run
+
+    Returns:
+        (dict[str, tuple[float, float]]): each player's rating and the
+            half-width of its 95% confidence interval
+    """
+    # (dict[tuple[str, str], float]): games and points between each pair,
+    # from the first player's view, including the virtual draw
+    games = {}
+    points = {}
+    for (a, b), (wins, draws, losses) in results.items():
+        for x, y, score in ((a, b, wins + draws / 2), (b, a, losses + draws / 2)):
+            games[(x, y)] = games.get((x, y), 0) + wins + draws + losses + 1
+            points[(x, y)] = points.get((x, y), 0) + score + 0.5
+
+    # Minorization-maximization updates of each player's strength
+    strength = {name: 1.0 for name in names}
+    for _ in range(iterations):
+        for name in names:
+            won = 0
+            expected = 0
+            for (x, y), count in games.items():
+                if x == name:
+                    won += points[(x, y)]
+                    expected += count / (strength[x] + strength[y])
+            if expected > 0:
+                strength[name] = won / expected
+        mean_log = sum(math.log(s) for s in strength.values()) / len(names)
+        strength = {name: s / math.exp(mean_log) for name, s in strength.items()}
+
+    ratings = {}
+    for name in names:
+        # Fisher information of the player's log-strength
+        information = 0
+        for (x, y), count in games.items():
+            if x == name:
+                p = strength[x] / (strength[x] + strength[y])
+                information += count * p * (1 - p)
+        elo = 400 * math.log10(strength[name])
+        if information > 0:
+            error = 1.96 * 400 / math.log(10) / math.sqrt(information)
+        else:
+            error = math.inf
+        ratings[name] = (elo, error)
+
+    return ratings
+
+def elo_to_score(elo):
+    """
+    Converts an Elo difference to the expected score of the stronger side.
+
+    Parameters:
+        (float) elo: the Elo difference
+
+    Returns:
+        (float): the expected score, between 0 and 1
+    """
+    return 1 / (1 + 10 ** (-elo / 400))
+
+def sprt_bounds(alpha, beta):
+    """
+    Returns the log-likelihood ratio bounds of a sequential probability
+    ratio test.
+
+    Parameters:
+        (float) alpha: the chance of accepting H1 when H0 is true
+        (float) beta: the chance of accepting H0 when H1 is true
+
+    Returns:
+        (tuple[float, float]): the lower bound (accept H0) and the upper
+            bound (accept H1)
+    """
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+def sprt_llr(wins, draws, losses, elo0, elo1):
+    """
+    Computes the log-likelihood ratio of H1 (the Elo difference is elo1)
+    against H0 (the Elo difference is elo0) from a match's wins, draws and
+    losses, using the normal approximation of the generalized SPRT.
+
+    Parameters:
+        (int) wins: games won by the tested side
+        (int) draws: games drawn
+        (int) losses: games lost by the tested side
+        (float) elo0: the Elo difference under H0
+        (float) elo1: the Elo difference under H1
+
+    Returns:
+        (float): the log-likelihood ratio (0 until both a win and a loss
+            have been seen)
+    """
+    games = wins + draws + losses
+    if wins == 0 or losses == 0:
+        return 0.0
+    score = (wins + draws / 2) / games
+    variance = (wins + draws / 4) / games - score ** 2
+    if variance <= 0:
+        return 0.0
+    s0 = elo_to_score(elo0)
+    s1 = elo_to_score(elo1)
+    return games * (s1 - s0) * (2 * score - s0 - s1) / (2 * variance)
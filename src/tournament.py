@@ -0,0 +1,202 @@
+"""
+Round-robin tournaments between bot configurations
+"""
+import json
+import multiprocessing
+
+from bot import play_game, make_bot
+from openings import apply_opening
+from stats import fit_elo
+
+def load_configs(path, board):
+    """
+    Loads bot configurations from a JSON file holding a list of objects.
+    Each object is a make_bot configuration (see bot.py), with an optional
+    "name" used in the results. Every bot is built once here, so a bad
+    configuration is reported before any game is played.
+
+    Ex: [{"name": "greedy", "skill": 1, "depth": 1},
+         {"name": "mcts", "engine": "mcts", "playouts": 100}]
+
+    Parameters:
+        (str) path: the file to load
+        (Board) board: the board the tournament starts from (it is copied,
+            not played on)
+
+    Returns:
+        (list[tuple[str, dict]]): each bot's name and configuration
+    """
+    with open(path) as f:
+        data = json.load(f)
+    if not isinstance(data, list):
+        raise ValueError(f"{path} should hold a list of bot configurations")
+
+    configs = []
+    for index, entry in enumerate(data):
+        if not isinstance(entry, dict):
+            raise ValueError(f"bot {index + 1} in {path} is not an object")
+        config = dict(entry)
+        name = str(config.pop("name", f"bot{index + 1}"))
+        if name in [other for other, _ in configs]:
+            raise ValueError(f"bot name '{name}' is used more than once")
+        try:
+            make_bot(board.clone(), "black", config)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"bot {index + 1} ('{name}') in {path} has a bad "
+                             f"configuration: {e}") from e
+        configs.append((name, config))
+    return configs
+
+def schedule(num_bots, games):
+    """
+    Lists every game of a round robin. Each pair plays the given number of
+    games, and since play_game alternates colors by game index, each bot
+    plays both colors equally often when the number is even.
+
+    Parameters:
+        (int) num_bots: how many bots take part
+        (int) games: how many games each pair plays
+
+    Returns:
+        (list[tuple[int, int, int]]): the first bot, second bot and game
+            index of each game
+    """
+    return [(a, b, i) for a in range(num_bots) for b in range(a + 1, num_bots)
+            for i in range(games)]
+
+# (tuple): the arguments shared by every game a pool worker plays, set by
+# _init_worker
+_worker_game = None
+
+def _init_worker(start, configs, turn_limit, seed, openings):
+    """
+    Stores the shared tournament arguments in a pool worker process
+
+    Parameters:
+        See run_tournament
+
+    Returns: None
+    """
+    global _worker_game
+    _worker_game = (start, configs, turn_limit, seed, openings)
+
+def _play_scheduled_game(game):
+    """
+    Plays one scheduled game
+
+    Parameters:
+        (tuple[int, int, int]) game: the first bot, second bot and game index
+
+    Returns:
+        (tuple[int, int, dict]): the two bots and the game's record
+    """
+    start, configs, turn_limit, seed, openings = _worker_game
+    a, b, i = game
+    if seed is not None:
+        seed = f"{seed}:{a}-{b}"
+    record = play_game(start, i, configs[a][1], configs[b][1], turn_limit,
+                       seed = seed, openings = openings)
+    return a, b, record
+
+def run_tournament(board, configs, games, turn_limit = -1, workers = 1,
+                   seed = None, openings = None):
+    """
+    Plays a round robin between bot configurations
+
+    Parameters:
+        (Board) board: the board every game starts from
+        (list[tuple[str, dict]]) configs: each bot's name and configuration
+        (int) games: how many games each pair plays
+        (int) turn_limit: see play_game
+        (int) workers: how many processes to play games in
+        (int) seed: if given, every game is seeded from this seed, its pair
+            and its index
+        (list[str]) openings: if given, games start after these openings
+            (see play_game)
+
+    Returns:
+        (dict[tuple[str, str], list[int]]): the wins, draws and losses of
+            the first bot of each pair against the second
+    """
+    # Check every opening before any games are played
+    for opening in openings or []:
+        apply_opening(board.clone(), opening)
+
+    names = [name for name, _ in configs]
+    results = {(names[a], names[b]): [0, 0, 0]
+               for a, b, _ in schedule(len(configs), 1)}
+
+    args = (board, configs, turn_limit, seed, openings)
+    games_list = schedule(len(configs), games)
+    if workers > 1:
+        pool = multiprocessing.Pool(workers, _init_worker, args)
+        played = pool.imap_unordered(_play_scheduled_game, games_list)
+    else:
+        pool = None
+        _init_worker(*args)
+        played = map(_play_scheduled_game, games_list)
+
+    try:
+        for done, (a, b, record) in enumerate(played, 1):
+            tally = results[(names[a], names[b])]
+            if record["winner"] == "bot1":
+                tally[0] += 1
+            elif record["winner"] == "bot2":
+                tally[2] += 1
+            else:
+                tally[1] += 1
+            print(f"Game {done}/{len(games_list)} complete: "
+                  f"{names[a]} vs {names[b]}")
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+    return results
+
+def format_results(names, results):
+    """
+    Formats a tournament's Elo ratings and cross-table. Each cross-table
+    cell holds the row bot's wins, draws and losses against the column bot.
+
+    Parameters:
+        (list[str]) names: the bots, in their configured order
+        (dict[tuple[str, str], list[int]]) results: see run_tournament
+
+    Returns:
+        (str): the table
+    """
+    ratings = fit_elo(names, results)
+    ranked = sorted(names, key = lambda name: ratings[name][0], reverse = True)
+
+    def record(x, y):
+        if (x, y) in results:
+            return results[(x, y)]
+        wins, draws, losses = results[(y, x)]
+        return [losses, draws, wins]
+
+    lines = []
+    width = max(len(name) for name in names)
+    lines.append(f"{'Rank':<5}{'Name':<{width + 2}}{'Elo':>7}{'+/-':>7}"
+                 f"{'Games':>7}{'Score':>8}")
+    for rank, name in enumerate(ranked, 1):
+        totals = [sum(col) for col in
+                  zip(*[record(name, other) for other in names if other != name])]
+        played = sum(totals)
+        score = (totals[0] + totals[1] / 2) / played if played else 0
+        elo, error = ratings[name]
+        lines.append(f"{rank:<5}{name:<{width + 2}}{elo:>7.0f}{error:>7.0f}"
+                     f"{played:>7}{100 * score:>7.1f}%")
+
+    lines.append("")
+    cell = max(width, 11)
+    lines.append(" " * (width + 2) + "".join(f"{name:>{cell + 1}}" for name in ranked))
+    for name in ranked:
+        cells = []
+        for other in ranked:
+            if other == name:
+                cells.append("-")
+            else:
+                cells.append("-".join(str(x) for x in record(name, other)))
+        lines.append(f"{name:<{width + 2}}" + "".join(f"{c:>{cell + 1}}" for c in cells))
+
+    return "\n".join(lines)
@@ -1,11 +1,17 @@
 # Implements a TUI for this Checkers game.
 
+import select
+import shutil
+import sys
+import threading
 import time
 import click
 from termcolor import colored
 
 from checkers import CheckerBoard
 from bot import Bot
+from mcts import MCTSBot
+from archive import ArchiveWriter
 from utils import MoveTree, loc_to_idx, idx_to_loc, col_to_letter, tuple_avg
 
 def help_me():
@@ -23,25 +29,36 @@ def help_me():
         - x = the opponent's pieces that have been captured during this move
     """)
 
+class QuitGame(Exception):
+    """
+    Raised when the game has to stop before it is over: the user quit while
+    a bot was thinking, or a replay ran out of moves or hit an illegal one.
+    The message, if any, says why.
+    """
+
 class TUIPlayer:
     """
     Simple class to store information about a TUI player
     A TUI player can either a human player using the keyboard,
     or a bot.
     """
-    def __init__(self, number, player_type, board, color, bot_delay):
+    def __init__(self, number, player_type, board, color, bot_delay,
+                 script=None):
         """
         Constructor
         Args:
             n: The player's number (1 or 2)
-            player_type: "human", "random-bot", or "smart-bot"
+            player_type: "human", "random-bot", "smart-bot", "mcts-bot" or
+                "replay"
             board: The Checkerboard
             color: The player's color
             bot_delay: When playing as a bot, an artificial delay
                 (in seconds) to wait before making a move.
+            script: When playing a replay, an iterator of (move number,
+                move text) pairs shared by both players (see read_replay)
         """
         # Parses what type of player this is
-        if player_type == "human":
+        if player_type in ("human", "replay"):
             self.name = f"Player {number}"
             self.bot = None
         if player_type == "random-bot":
@@ -50,10 +67,15 @@ class TUIPlayer:
         elif player_type == "smart-bot":
             self.name = f"Smart Bot {number}"
             self.bot = Bot(board, color, 1)
+        elif player_type == "mcts-bot":
+            self.name = f"MCTS Bot {number}"
+            self.bot = MCTSBot(board, color, playouts=None, time_ms=1000)
 
+        self.player_type = player_type
         self.board = board
         self.color = color
         self.bot_delay = bot_delay
+        self.script = script
 
     def get_move(self, board):
         """
@@ -67,25 +89,23 @@ class TUIPlayer:
         Returns: (Move): the move the player would like to make
         """
         if self.bot is not None:
-            # If this player is a bot
-            time.sleep(self.bot_delay) # Pause for animation purposes
-
-            # Get the bot's move
-            move = self.bot.suggest_move()
-
-            # Prints information about the bot's move
-            steps = [idx_to_loc(step, board.get_size()) for step in move.get_steps()]
-            captured = [idx_to_loc(pc, board.get_size()) for pc in move.get_captured()]
-            if len(captured) == 0:
-                captured_str = ""
-            else:
-                captured_str = " and captured the pieces at " + ", ".join(captured)
-            print(f"{self.name} moved from " + " to ".join(steps) + captured_str)
+            # If this player is a bot, get its move
+            move = self.think(board)
+            self.print_move(board, move)
+            return move
 
+        elif self.script is not None:
+            # If this player is replaying a game, read its move
+            move = self.read_move(board)
+            self.print_move(board, move)
             return move
 
         else:
             # If this player is a human
+            # Builds a MoveTree of all the player's moves, whose first
+            # level holds the pieces that can move
+            tree = MoveTree(board.get_player_moves(self.color), all_pieces=True)
+
             # Ask for a piece to move until a valid piece is given
             while True:
                 print_board(board,
@@ -113,7 +133,7 @@ class TUIPlayer:
                 elif piece.get_color() != self.color:
                     print("That's not your piece!")
                     continue
-                elif len(board.get_piece_moves(idx)) == 0:
+                elif not tree.has_next_move(idx):
                     print("That piece can't move!")
                     continue
                 else:
@@ -125,9 +145,8 @@ class TUIPlayer:
                     else:
                         continue
 
-            # Gets the possible moves for this piece and populates a MoveTree
-            moves = board.get_piece_moves(idx)
-            tree = MoveTree(moves)
+            # Narrows the MoveTree down to this piece's moves
+            tree.traverse(idx)
 
             current = tree.get_current_loc()
             captured = set()
@@ -166,13 +185,13 @@ class TUIPlayer:
                         print("Invalid location!")
                         continue
 
-                    if move_idx in next_moves:
+                    if tree.has_next_move(move_idx):
                         # If the requested move is possible
                         # Perform the move and update captured as needed
                         if move_idx[0] - current[0] in {-2, 2}:
                             captured.add(tuple_avg(current, move_idx))
                         move = tree.traverse(move_idx)
-                        new_loc = idx_to_loc(next_moves[0], board.get_size())
+                        new_loc = idx_to_loc(move_idx, board.get_size())
                         print(f"Moved to {new_loc}")
                         if move is not None:
                             return move
@@ -182,6 +201,170 @@ class TUIPlayer:
                 current = tree.get_current_loc()
                 time.sleep(0.5)
 
+    def print_move(self, board, move):
+        """
+        Prints information about a move the player made without typing it in
+
+        Parameters:
+            board (CheckerBoard): the board on which the game is taking place
+            move (Move): the move
+
+        Returns: None
+        """
+        steps = [idx_to_loc(step, board.get_size()) for step in move.get_steps()]
+        captured = [idx_to_loc(pc, board.get_size()) for pc in move.get_captured()]
+        if len(captured) == 0:
+            captured_str = ""
+        else:
+            captured_str = " and captured the pieces at " + ", ".join(captured)
+        print(f"{self.name} moved from " + " to ".join(steps) + captured_str)
+
+    def read_move(self, board):
+        """
+        Takes the player's next move from the replay script, checking it the
+        same way as moves typed in by a human (but without any prompts or
+        pauses)
+
+        Parameters:
+            board (CheckerBoard): the board on which the game is taking place
+
+        Returns: (Move): the move
+        """
+        number, text = next(self.script, (None, None))
+        if text is None:
+            raise QuitGame("The replay ended before the game did.")
+
+        # Follows the move's squares down a MoveTree of all the player's
+        # moves, the first square picking the piece
+        tree = MoveTree(board.get_player_moves(self.color), all_pieces=True)
+        move = None
+        try:
+            for loc in text.split("-"):
+                if move is not None:
+                    # The move already ended
+                    raise ValueError
+                move = tree.traverse(loc_to_idx(loc, board.get_size()))
+        except (ValueError, TypeError, AssertionError):
+            move = None
+        if move is None:
+            raise QuitGame(f"Move {number} of the replay ({text}) is not a "
+                           f"legal move for {self.name}.")
+        return move
+
+    def think(self, board):
+        """
+        Lets the bot search in the background while showing how long it has
+        been thinking, how many positions it has searched and the move it
+        would make now. Pressing Enter makes it move at once and typing q
+        quits the game. The bot delay runs at the same time as the search,
+        so the bot moves after whichever of the two takes longer.
+
+        Parameters:
+            board (CheckerBoard): the board on which the game is taking place
+
+        Returns: (Move): the bot's move
+        """
+        stop = threading.Event()
+        # The move, or the error the search raised, which is raised again
+        # here rather than lost with the thread
+        result = []
+        error = []
+
+        def search():
+            try:
+                result.append(self.bot.suggest_move(stop))
+            except Exception as e:
+                error.append(e)
+
+        thread = threading.Thread(target=search, daemon=True)
+        started = time.perf_counter()
+        thread.start()
+        # Quick searches end before the status line is worth showing
+        thread.join(0.1)
+
+        # Keys can only be read from a terminal, since otherwise the input
+        # may be meant for something else
+        interactive = sys.stdin.isatty()
+        width = 0
+        forced = False
+        while True:
+            elapsed = time.perf_counter() - started
+            if not thread.is_alive() and (forced or error
+                                          or elapsed >= self.bot_delay):
+                break
+            best = self.bot.get_best_move()
+            best_str = "-" if best is None else "-".join(
+                idx_to_loc(step, board.get_size()) for step in best.get_steps())
+            status = (f"{self.name} is thinking: {elapsed:.1f}s, "
+                      f"{self.bot.get_nodes()} nodes, best {best_str} "
+                      f"(Enter to move now, q to quit)")
+            print("\r" + status.ljust(width), end="", flush=True)
+            width = len(status)
+
+            if thread.is_alive():
+                wait = 0.1
+            else:
+                wait = min(0.1, self.bot_delay - elapsed)
+            line = None
+            if interactive:
+                line = _wait_for_line(wait)
+            elif thread.is_alive():
+                thread.join(wait)
+            else:
+                time.sleep(wait)
+            if line is not None:
+                stop.set()
+                thread.join()
+                if line == "q":
+                    print()
+                    raise QuitGame()
+                forced = True
+
+        # Clear the status line
+        if width:
+            print("\r" + " " * width + "\r", end="", flush=True)
+        thread.join()
+        if error:
+            raise error[0]
+        return result[0]
+
+# (DiffRenderer): the renderer print_board draws with, or None to print
+# every board in full (see set_renderer)
+_renderer = None
+
+def set_renderer(renderer):
+    """
+    Chooses how print_board draws boards from now on.
+
+    Parameters:
+        renderer (DiffRenderer): the renderer to draw with, or None to print
+            every board in full
+
+    Returns: None
+    """
+    global _renderer
+    _renderer = renderer
+
+def _wait_for_line(timeout):
+    """
+    Waits up to timeout seconds for the user to type a line.
+
+    Parameters:
+        timeout (float): how many seconds to wait
+
+    Returns:
+        (str): the line typed, or None if there was none
+    """
+    try:
+        ready, _, _ = select.select([sys.stdin], [], [], timeout)
+    except (OSError, ValueError):
+        # Windows can't select on standard input
+        time.sleep(timeout)
+        return None
+    if not ready:
+        return None
+    return sys.stdin.readline().strip()
+
 def print_board(board, highlight=None, captured=None, moves=None, piece=None):
     """
     Prints the board to the screen. Lets the player type "help" for info
@@ -196,38 +379,42 @@ def print_board(board, highlight=None, captured=None, moves=None, piece=None):
 
     Returns: None
     """
+    grid = board_cells(board, highlight, captured, moves, piece)
+    if _renderer is not None:
+        _renderer.draw(grid)
+    else:
+        print(format_board(grid))
+
+def board_cells(board, highlight=None, captured=None, moves=None, piece=None):
+    """
+    Works out what print_board shows in each square of the board.
+
+    Parameters:
+        See print_board
+
+    Returns:
+        (List[List[str]]): the text of each square, colors included
+    """
     board_grid = board.get_grid()
-    nrows = len(board_grid)
-    ncols = len(board_grid[0])
-    grid = [["" for _ in range(ncols)] for _ in range(nrows)]
+    cache = _get_render_cache(len(board_grid), len(board_grid[0]))
+    grid = [list(row) for row in cache.empty]
 
     # Convert grid items to strings
-    for i in range(nrows):
-        for j in range(ncols):
-            if board_grid[i][j] is None:
-                if (i + j) % 2 == 0:
-                    grid[i][j] = "□"
-                else:
-                    grid[i][j] = "■"
-            else:
-                piece_str = str(board_grid[i][j])
-                color_pieces = {
-                    "b": colored("b", "blue"),
-                    "B": colored("B", "blue"),
-                    "r": colored("r", "red"),
-                    "R": colored("R", "red")
-                }
-                if highlight is None or (highlight is not None and (i, j) not in highlight):
-                    # If the piece is not supposed to be yellow
-                    grid[i][j] = color_pieces[piece_str]
-                else:
-                    grid[i][j] = piece_str
+    for i, row in enumerate(board_grid):
+        for j, square in enumerate(row):
+            if square is not None:
+                grid[i][j] = cache.pieces[str(square)]
 
     # Display highlighted characters
     if highlight is not None:
         for loc in highlight:
             i, j = loc
-            grid[i][j] = colored(grid[i][j], "yellow")
+            square = board_grid[i][j]
+            if square is None:
+                plain = cache.empty[i][j]
+            else:
+                plain = str(square)
+            grid[i][j] = cache.highlighted[plain]
 
     # Display captured pieces
     if captured is not None:
@@ -247,26 +434,200 @@ def print_board(board, highlight=None, captured=None, moves=None, piece=None):
         i2, j2 = piece[1]
         grid[i2][j2] = grid[i1][j1]
         if piece[0] != piece[1]:
-            if (i1 + j1) % 2 == 0:
-                grid[i1][j1] = "□"
-            else:
-                grid[i1][j1] = "■"
+            grid[i1][j1] = cache.empty[i1][j1]
+
+    return grid
+
+def format_board(grid):
+    """
+    Lays out the squares of a board with row numbers and column letters.
+
+    Parameters:
+        grid (List[List[str]]): the text of each square (see board_cells)
+
+    Returns:
+        (str): the board as printed, without a final newline
+    """
+    cache = _get_render_cache(len(grid), len(grid[0]))
+    return cache.template.format(*[cell for row in grid for cell in row])
 
-    result = ""
-    padding = len(str(nrows)) # Left-side whitespace
-    for i, row in enumerate(grid):
-        # Display each row with row numbers on the left hand side
-        row_str = " ".join(row)
-        row_num = nrows - i
-        result += str(row_num).rjust(padding) + "|" + row_str + "\n"
-    # Display bottom line and column letters
-    result += " " * padding + "└" + "─" * (ncols * 2) + "\n"
-    letter_row = [col_to_letter(i).ljust(2) for i in range(ncols)]
-    result += " " * (padding + 1) + "".join(letter_row)
+class _RenderCache:
+    """
+    Everything about drawing a board of one size that doesn't depend on the
+    position: the empty squares, the colored pieces and a template of the
+    whole frame with a slot for each square
+    """
+    def __init__(self, nrows, ncols):
+        """
+        Constructor
+
+        Args:
+            nrows: the number of rows of the board
+            ncols: the number of columns of the board
+        """
+        # (List[List[str]]): the text of each square when it is empty
+        self.empty = [["□" if (i + j) % 2 == 0 else "■" for j in range(ncols)]
+                      for i in range(nrows)]
+
+        # (Dict[str, str]): each piece's colored letter
+        self.pieces = {
+            "b": colored("b", "blue"),
+            "B": colored("B", "blue"),
+            "r": colored("r", "red"),
+            "R": colored("R", "red")
+        }
+
+        # (Dict[str, str]): each piece letter and empty square in yellow
+        self.highlighted = {text: colored(text, "yellow")
+                            for text in ("b", "B", "r", "R", "□", "■")}
+
+        # (str): the frame, with a {} for each square in reading order
+        lines = []
+        padding = len(str(nrows)) # Left-side whitespace
+        for i in range(nrows):
+            # Each row with its row number on the left hand side
+            row_num = nrows - i
+            lines.append(str(row_num).rjust(padding) + "|"
+                         + " ".join(["{}"] * ncols))
+        # Bottom line and column letters
+        lines.append(" " * padding + "└" + "─" * (ncols * 2))
+        letter_row = [col_to_letter(i).ljust(2) for i in range(ncols)]
+        lines.append(" " * (padding + 1) + "".join(letter_row))
+        self.template = "\n".join(lines)
+
+# (Dict[Tuple[int, int], _RenderCache]): render caches by board dimensions
+_render_caches = {}
+
+def _get_render_cache(nrows, ncols):
+    """
+    Returns the render cache for a board size, creating it the first time.
+
+    Parameters:
+        nrows (int): the number of rows of the board
+        ncols (int): the number of columns of the board
+
+    Returns:
+        (_RenderCache): the cache
+    """
+    if (nrows, ncols) not in _render_caches:
+        _render_caches[(nrows, ncols)] = _RenderCache(nrows, ncols)
+    return _render_caches[(nrows, ncols)]
+
+class FinalRenderer:
+    """
+    Keeps only the last board it is asked to draw and prints it when closed,
+    for replays where only the final position matters
+    """
+    def __init__(self):
+        """
+        Constructor
+        """
+        # The last grid drawn, or None before the first
+        self._grid = None
+
+    def draw(self, grid):
+        """
+        Remembers a frame instead of drawing it
+
+        Args:
+            grid: the text of each square (see board_cells)
+        """
+        self._grid = grid
+
+    def close(self):
+        """
+        Prints the last frame, if it hasn't been printed already
+        """
+        if self._grid is not None:
+            print(format_board(self._grid))
+            self._grid = None
+
+class DiffRenderer:
+    """
+    Draws boards at the top of the terminal using ANSI escape codes. After
+    the first frame, only the squares that changed since the last frame are
+    rewritten. Everything else printed scrolls in the area below the board,
+    so the board never moves.
+    """
+    def __init__(self, stream=None):
+        """
+        Constructor
 
-    print(result)
+        Args:
+            stream: where to draw (default is standard output, which should
+                be a terminal)
+        """
+        # (file): where frames are written
+        self._stream = stream if stream is not None else sys.stdout
+
+        # (List[List[str]]): the squares of the last frame drawn, or None if
+        # the next frame must be drawn in full
+        self._last = None
+
+        # (int): the terminal height the last full frame was drawn for
+        self._height = None
+
+    def draw(self, grid):
+        """
+        Draws a frame, rewriting only the squares that changed unless the
+        board or the terminal changed size. A terminal too short to hold the
+        board and a line below it gets the whole board printed as plain text.
+
+        Parameters:
+            grid (List[List[str]]): the text of each square (see board_cells)
 
-def play_checkers(board, players):
+        Returns: None
+        """
+        nrows = len(grid)
+        ncols = len(grid[0])
+        height = shutil.get_terminal_size().lines
+        top = nrows + 3
+        last = self._last
+        if height <= top:
+            # With no room below the board for a scroll region, print the
+            # board like any other text until the terminal is tall enough
+            out = ["\x1b[r", format_board(grid), "\n"]
+            self._height = None
+            self._last = None
+            self._stream.write("".join(out))
+            self._stream.flush()
+            return
+        if (last is None or len(last) != nrows or len(last[0]) != ncols
+                or height != self._height):
+            # Clear the screen, draw the whole board and let the lines below
+            # it scroll on their own
+            out = ["\x1b[r\x1b[H\x1b[2J", format_board(grid).replace("\n", "\r\n"),
+                   f"\x1b[{top};{height}r\x1b[{top};1H"]
+            self._height = height
+        else:
+            # Rewrite the changed squares, then put the cursor back where the
+            # text below the board left it
+            padding = len(str(nrows))
+            out = ["\x1b7"]
+            for i in range(nrows):
+                for j in range(ncols):
+                    if grid[i][j] != last[i][j]:
+                        out.append(f"\x1b[{i + 1};{padding + 2 + 2 * j}H"
+                                   + grid[i][j])
+            out.append("\x1b8")
+        self._last = [list(row) for row in grid]
+        self._stream.write("".join(out))
+        self._stream.flush()
+
+    def close(self):
+        """
+        Gives the whole terminal back to normal scrolling
+
+        Parameters: None
+
+        Returns: None
+        """
+        height = shutil.get_terminal_size().lines
+        self._stream.write(f"\x1b[r\x1b[{height};1H\n")
+        self._stream.flush()
+        self._last = None
+
+def play_checkers(board, players, archive=None):
     """
     Plays a game of Checkers on the terminal
 
@@ -274,6 +635,9 @@ def play_checkers(board, players):
         board (CheckerBoard): The board to play on
         players (Dict[str, TUIPlayer]): A dictionary mapping piece colors to
             TUIPlayer objects
+        archive (str): if given, the game is appended to this game archive
+            (see archive.py) when it ends, or with the reason "quit" if a
+            player quits
     
     Returns: None
     """
@@ -283,10 +647,22 @@ def play_checkers(board, players):
     # Keep playing until there is a winner:
     while board.game_over() is None:
         # Get and perform the next move
-        move = current.get_move(board)
+        try:
+            move = current.get_move(board)
+        except QuitGame as quit:
+            # A final-only replay shows where it stopped before saying why,
+            # even if no move was made
+            if isinstance(_renderer, FinalRenderer):
+                print_board(board)
+                _renderer.close()
+            print(quit.args[0] if quit.args else "Game quit.")
+            if archive is not None:
+                archive_game(archive, board, players, "draw", "quit")
+            return
         board.perform_move(move)
 
-        if players["black"].bot is not None and players["red"].bot is not None:
+        if all(player.bot is not None or player.script is not None
+               for player in players.values()):
             print_board(board)
 
         # Update the player
@@ -297,6 +673,10 @@ def play_checkers(board, players):
 
     print()
     print_board(board)
+    # A final-only replay prints the final position now, before the result,
+    # rather than when its renderer closes
+    if isinstance(_renderer, FinalRenderer):
+        _renderer.close()
 
     winner = board.game_over()
     if winner != "draw":
@@ -304,30 +684,97 @@ def play_checkers(board, players):
     else:
         print("It's a tie!")
 
+    if archive is not None:
+        archive_game(archive, board, players, winner, board.get_end_reason())
+
+def archive_game(archive, board, players, winner, reason):
+    """
+    Appends a game to a game archive
+
+    Parameters:
+        archive (str): the archive's data file (see archive.py)
+        board (CheckerBoard): the board the game was played on
+        players (Dict[str, TUIPlayer]): the players, by color
+        winner (str): "black", "red" or "draw"
+        reason (str): why the game ended (see archive.REASONS)
+
+    Returns: None
+    """
+    with ArchiveWriter(archive) as archiver:
+        archiver.write_game(board.get_size(), players["black"].player_type,
+                            players["red"].player_type, winner, reason,
+                            [move.get_steps()
+                             for move in board.get_move_history()])
+
+def read_replay(lines):
+    """
+    Reads the moves of a replay: moves like "E3-F4" (the squares a piece
+    visits, separated by dashes), black moving first, separated by spaces or
+    newlines. Lines starting with "#" are skipped.
+
+    Parameters:
+        lines (Iterable[str]): the replay's lines, e.g. an open file
+
+    Returns: (Iterator[Tuple[int, str]]): the move number and text of each
+        move, read as they are needed
+    """
+    number = 0
+    for line in lines:
+        if line.lstrip().startswith("#"):
+            continue
+        for text in line.split():
+            number += 1
+            yield number, text
+
 
 # Command-line interface
 
 @click.command(name="checkers-tui")
 @click.option('--player1',
-              type=click.Choice(['human', 'random-bot', 'smart-bot'], case_sensitive=False),
+              type=click.Choice(['human', 'random-bot', 'smart-bot', 'mcts-bot'], case_sensitive=False),
               default="human")
 @click.option('--player2',
-              type=click.Choice(['human', 'random-bot', 'smart-bot'], case_sensitive=False),
+              type=click.Choice(['human', 'random-bot', 'smart-bot', 'mcts-bot'], case_sensitive=False),
               default="smart-bot")
 @click.option('--bot-delay', type=click.FLOAT, default=0.5)
+@click.option('--archive', type=click.Path(dir_okay=False), default=None)
+@click.option('--diff-render', is_flag=True, default=False)
+@click.option('--replay', type=click.File('r'), default=None)
+@click.option('--final-only', is_flag=True, default=False)
 
-def cmd(player1, player2, bot_delay):
+def cmd(player1, player2, bot_delay, archive, diff_render, replay, final_only):
     """
     Runs the game from the command line
     """
+    if final_only and replay is None:
+        raise click.UsageError("--final-only only works with --replay")
+    if final_only and diff_render:
+        raise click.UsageError("--final-only and --diff-render can't be used together")
+
     board = CheckerBoard(3)
 
-    player1 = TUIPlayer(1, player1, board, "black", bot_delay)
-    player2 = TUIPlayer(2, player2, board, "red", bot_delay)
+    script = None
+    if replay is not None:
+        # Both players take their moves from the replay
+        script = read_replay(replay)
+        player1 = player2 = "replay"
+
+    player1 = TUIPlayer(1, player1, board, "black", bot_delay, script)
+    player2 = TUIPlayer(2, player2, board, "red", bot_delay, script)
 
     players = {"black": player1, "red": player2}
 
-    play_checkers(board, players)
+    if not diff_render and not final_only:
+        play_checkers(board, players, archive)
+        return
+
+    renderer = FinalRenderer() if final_only else DiffRenderer()
+    set_renderer(renderer)
+    try:
+        play_checkers(board, players, archive)
+    finally:
+        renderer.close()
+        set_renderer(None)
 
 
 if __name__ == "__main__":
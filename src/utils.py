@@ -46,6 +46,39 @@ def tuple_avg(t1, t2):
     y3 = int((y1 + y2) / 2)
     return (x3, y3)
 
+_LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+# (list[str]): the names of the columns seen so far, in order (see
+# col_to_letter)
+_column_names = []
+
+# (dict[int, tuple[list[list[str]], dict[str, tuple[int, int]]]]): the
+# location names of each board size's squares, and the squares of each name
+# (see _get_coordinate_map)
+_coordinate_maps = {}
+
+def _get_coordinate_map(board_size):
+    """
+    Returns the coordinate lookup tables for a board size, building them the
+    first time they are asked for.
+
+    Parameters:
+        board_size (int): the side length of the board
+
+    Returns:
+        (tuple[list[list[str]], dict[str, tuple[int, int]]]): the name of each
+            square, indexed by row and column, and the square of each name
+    """
+    if board_size not in _coordinate_maps:
+        names = [[col_to_letter(col) + str(board_size - row)
+                  for col in range(board_size)]
+                 for row in range(board_size)]
+        indices = {name: (row, col)
+                   for row, names_row in enumerate(names)
+                   for col, name in enumerate(names_row)}
+        _coordinate_maps[board_size] = (names, indices)
+    return _coordinate_maps[board_size]
+
 def loc_to_idx(loc, board_size):
     """
     Takes a location in the form "E5" and translates it to indices usable
@@ -60,6 +93,14 @@ def loc_to_idx(loc, board_size):
     Returns:
         (tuple[int, int]): the grid index of the given location
     """
+    if isinstance(loc, str):
+        idx = _get_coordinate_map(board_size)[1].get(loc)
+        if idx is not None:
+            return idx
+
+    # Anything that isn't a square's name as written by idx_to_loc is parsed,
+    # so that other spellings of a square (e.g. "A05") still work and bad
+    # locations raise the same errors as always
     assert isinstance(loc, str)
     assert sum([d.isdigit() for d in loc]) != 0 # There is at least one number
     assert sum([d.isalpha() for d in loc]) != 0 # There is at least one letter
@@ -75,15 +116,13 @@ def loc_to_idx(loc, board_size):
     loc_row = int(loc[div:])
     loc_col = loc[:div][::-1] # Reversed for later steps
 
-    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
-
     row = board_size - loc_row
     assert 0 <= row and row < board_size
 
     # Calculate column number from letters
     col = -1
     for i, letter in enumerate(loc_col):
-        val = letters.index(letter)
+        val = _LETTERS.index(letter)
         col += (val + 1) * (26 ** i)
     assert col < board_size
 
@@ -104,26 +143,13 @@ def idx_to_loc(idx, board_size):
         (str): the location of the space in string form (e.g. "E4")
     """
     assert idx[0] in range(board_size) and idx[1] in range(board_size)
-
-    row = str(board_size - idx[0])
-
-    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
-    idx_col = idx[1]
-    col = ""
-
-    if idx_col == 0:
-        col = "A"
-    else:
-        col = letters[idx_col % 26]
-        if idx_col >= 26:
-            col = letters[idx_col // 26 - 1] + col
-    
-    return col + row
+    return _get_coordinate_map(board_size)[0][idx[0]][idx[1]]
 
 def col_to_letter(col_idx):
     """
     Takes a column number (zero-indexed) and translates it to the letter(s)
-    corresponding to that column
+    corresponding to that column, counting A to Z, then AA to ZZ, then AAA
+    and so on
 
     Ex: col_to_letter(3) -> "D"
         col_to_letter(27) -> "AB"
@@ -134,28 +160,29 @@ def col_to_letter(col_idx):
     Returns:
         (str): the letter(s) corresponding to that column
     """
-    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
-    col = col_idx
-    result = ""
-
-    if col == 0:
-        return "A"
-    else:
-        result = letters[col % 26]
-        if col >= 26:
-            result = letters[col // 26 - 1] + result
-    return result
+    while len(_column_names) <= col_idx:
+        # Names the next column in bijective base 26
+        col = len(_column_names) + 1
+        result = ""
+        while col > 0:
+            col, val = divmod(col - 1, 26)
+            result = _LETTERS[val] + result
+        _column_names.append(result)
+    return _column_names[col_idx]
 
 class Node:
     """
     Class representing a node in a MoveTree
     """
+    __slots__ = ("_loc", "_next_steps", "_move")
+
     def __init__(self, loc):
         """
         Initializes a Node with the given location
         """
         self._loc = loc
-        self._next_steps = set()
+        # Child Nodes keyed by their locations
+        self._next_steps = {}
         self._move = None
 
     def get_loc(self):
@@ -168,20 +195,45 @@ class Node:
 
     def add_next_step(self, next):
         """
-        Adds a Node to self._next_steps
+        Adds a Node for the given location to self._next_steps, unless there
+        already is one
 
         Parameters:
             next (Tuples[int, int]): the step to add
+
+        Returns: (Node): the Node for that step
+        """
+        node = self._next_steps.get(next)
+        if node is None:
+            node = self._next_steps[next] = Node(next)
+        return node
+
+    def get_next_step(self, loc):
         """
-        self._next_steps.add(Node(next))
+        Gets the next step at the given location
+
+        Parameters:
+            loc (Tuple[int, int]): the location of the step
+
+        Returns: (Node or None): the Node, or None if there is no such step
+        """
+        return self._next_steps.get(loc)
 
     def get_next_steps(self):
         """
         Gets this node's next steps
 
-        Returns: (Set[Node])
+        Returns: (dict_values[Node])
+        """
+        return self._next_steps.values()
+
+    def get_next_locs(self):
+        """
+        Gets the locations of this node's next steps
+
+        Returns: (List[Tuple[int, int]])
         """
-        return self._next_steps
+        return list(self._next_steps)
 
     def set_move(self, move):
         """
@@ -204,11 +256,17 @@ class MoveTree:
     """
     Class representing a decision tree for moves a player could make
     """
-    def __init__(self, moves):
+    def __init__(self, moves, all_pieces=False):
         """
         Initializes an empty tree and populates it with the given moves
+
+        Parameters:
+            moves (Set[Move]): the moves to add to the tree
+            all_pieces (bool): whether the moves may start from different
+                pieces (e.g. a player's full move set); if so, the root has
+                no location and the first traverse picks the piece
         """
-        self._head = None
+        self._head = Node(None) if all_pieces else None
         self._populate_tree(moves)
         self._current = self._head
 
@@ -216,39 +274,28 @@ class MoveTree:
         """
         Adds the Move objects to the tree and attaches each Move to its
         corresponding leaf node (i.e. the leaf of the branch corresponding to
-        the sequence of locations in the Move). The moves must all begin at the
-        same spot. This method does not check validity of moves.
+        the sequence of locations in the Move). Unless the root has no
+        location, the moves must all begin at the same spot. This method does
+        not check validity of moves.
 
         Parameters:
             moves (Set[Move]): the set of moves to add to the tree
         """
         for move in moves:
+            locs = move.get_steps()
             if self._head is None:
                 # If the head hasn't been defined yet
                 # Make it the first step of this move
-                self._head = Node(move.get_steps()[0])
+                self._head = Node(locs[0])
 
-            locs = move.get_steps()
+            # Trace through Move, adding its steps to the tree (the root
+            # stands for the first step unless it has no location)
             current = self._head
+            for loc in locs[0 if current.get_loc() is None else 1:]:
+                current = current.add_next_step(loc)
 
-            # Trace through Move, adding its steps to the tree
-            for i in range(1, len(locs)):
-                # For each step
-                # Get locations of next Nodes
-                next_locs = [nxt.get_loc() for nxt in current.get_next_steps()]
-                if locs[i] not in next_locs:
-                    # If Move's next step isn't in existing next locations, add it
-                    current.add_next_step(locs[i])
-
-                # Set current to the Node corresponding to the next step
-                for next_step in current.get_next_steps():
-                    if next_step.get_loc() == locs[i]:
-                        current = next_step
-                        break
-                
-                # If at a leaf node, set Node's move to the Move that got you there
-                if i == len(locs) - 1:
-                    current.set_move(move)
+            # The leaf node holds the Move that got you there
+            current.set_move(move)
 
     def traverse(self, loc):
         """
@@ -261,15 +308,13 @@ class MoveTree:
         
         Returns: (Move or None): the Move (or lack thereof) associated with the new node
         """
-        # Set current to specified next node
-        for next_step in self._current.get_next_steps():
-            if next_step.get_loc() == loc:
-                self._current = next_step
-                # Return the new current Node's move (only not None if this is a leaf node)
-                return self._current.get_move()
-
-        # If loc doesn't correspond to a valid next step, raise an error
-        raise ValueError
+        next_step = self._current.get_next_step(loc)
+        if next_step is None:
+            # If loc doesn't correspond to a valid next step, raise an error
+            raise ValueError
+        self._current = next_step
+        # Return the new current Node's move (only not None if this is a leaf node)
+        return next_step.get_move()
 
     def _reset(self):
         """
@@ -281,7 +326,8 @@ class MoveTree:
         """
         Gets the current location
 
-        Returns: (Tuple[int, int])
+        Returns: (Tuple[int, int] or None): None at the root of a tree made
+            from several pieces' moves
         """
         return self._current.get_loc()
 
@@ -289,7 +335,17 @@ class MoveTree:
         """
         Gets the next moves from self._current
 
-        Returns: (Set[Tuple[int, int]])
+        Returns: (List[Tuple[int, int]])
+        """
+        return self._current.get_next_locs()
+
+    def has_next_move(self, loc):
+        """
+        Checks whether loc is one of the next moves from self._current
+
+        Parameters:
+            loc (Tuple[int, int]): the location to check
+
+        Returns: (bool)
         """
-        next_locs = [nxt.get_loc() for nxt in self._current.get_next_steps()]
-        return next_locs
+        return self._current.get_next_step(loc) is not None